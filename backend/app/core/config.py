@@ -30,7 +30,96 @@ class Settings(BaseModel):
     MODEL_CODE: str = (os.getenv("API_MODEL_CODE") or os.getenv("MODEL_CODE") or "").strip()
     MODEL_REPAIR: str = (os.getenv("API_MODEL_REPAIR") or os.getenv("MODEL_REPAIR") or "").strip()
 
+    # Abort LLM streams that go quiet (seconds to first token / between tokens)
+    LLM_FIRST_TOKEN_SECONDS: float = float(os.getenv("LLM_FIRST_TOKEN_SECONDS", "300"))
+    LLM_STALL_SECONDS: float = float(os.getenv("LLM_STALL_SECONDS", "60"))
+
     MAX_REPAIR_ATTEMPTS: int = int(os.getenv("MAX_REPAIR_ATTEMPTS", "2"))
 
+    # Token budget for the file context in repair prompts, with per-model overrides
+    # (MODEL_CONTEXT_TOKENS="qwen2.5-coder:7b=4000,gpt-4o-mini=16000")
+    REPAIR_CONTEXT_TOKENS: int = int(os.getenv("REPAIR_CONTEXT_TOKENS", "6000"))
+    MODEL_CONTEXT_TOKENS: dict[str, int] = {
+        name.strip(): int(tokens)
+        for name, _, tokens in (
+            item.rpartition("=") for item in os.getenv("MODEL_CONTEXT_TOKENS", "").split(",") if "=" in item
+        )
+    }
+
+    # Parallel repair: candidates requested per repair (1 = one patch at a time), each
+    # validated in its own workspace clone; models and temperatures are cycled across them
+    REPAIR_CANDIDATES: int = int(os.getenv("REPAIR_CANDIDATES", "1"))
+    REPAIR_MODELS: list[str] = [m.strip() for m in os.getenv("REPAIR_MODELS", "").split(",") if m.strip()]
+    REPAIR_TEMPERATURES: list[float] = [
+        float(t) for t in os.getenv("REPAIR_TEMPERATURES", "0.2,0.5,0.8").split(",") if t.strip()
+    ]
+
+    # Preview ports for generated apps (the backend's own port is never handed out)
+    BACKEND_PORT: int = int(os.getenv("BACKEND_PORT", "8000"))
+    PREVIEW_PORT_START: int = int(os.getenv("PREVIEW_PORT_START", "9000"))
+    PREVIEW_PORT_END: int = int(os.getenv("PREVIEW_PORT_END", "9999"))
+
+    # How the run stage validates an app: "server" boots uvicorn and probes it over HTTP,
+    # "asgi" imports main:app in the venv and drives it in memory (previews then start on demand)
+    VALIDATION_MODE: str = os.getenv("VALIDATION_MODE", "server")
+
+    # Successful repairs kept for replay, keyed by error fingerprint (0 disables the cache)
+    REPAIR_CACHE_MAX_ENTRIES: int = int(os.getenv("REPAIR_CACHE_MAX_ENTRIES", "500"))
+
+    # Scale-to-zero previews: live app cap (LRU-evicted) and idle time before an app is stopped
+    PREVIEW_MAX_LIVE: int = int(os.getenv("PREVIEW_MAX_LIVE", "20"))
+    PREVIEW_IDLE_SECONDS: int = int(os.getenv("PREVIEW_IDLE_SECONDS", "600"))
+
+    # "process": one uvicorn per preview; "shared": import compatible apps into the backend
+    # process and serve them in-process (apps that fail the check still get a process)
+    PREVIEW_HOST_MODE: str = os.getenv("PREVIEW_HOST_MODE", "process")
+
+    # Reverse proxy for /preview/{run_id}/...: upstream read timeout and pooled connections
+    PREVIEW_PROXY_TIMEOUT: int = int(os.getenv("PREVIEW_PROXY_TIMEOUT", "60"))
+    PREVIEW_PROXY_MAX_CONNECTIONS: int = int(os.getenv("PREVIEW_PROXY_MAX_CONNECTIONS", "200"))
+
+    # Seconds a generated app gets to answer GET / before the run counts as failed
+    PREVIEW_READY_SECONDS: float = float(os.getenv("PREVIEW_READY_SECONDS", "30"))
+
+    # Codegen mode:
+    #   llm      -> always ask the code model
+    #   template -> always use the deterministic scaffold + code_writer templates
+    #   auto     -> templates when the spec fits them, LLM otherwise
+    GENERATION_MODE: str = os.getenv("GENERATION_MODE", "llm").strip().lower()
+
+    # Per-stage deadlines and overall run budget (seconds).
+    # A codegen overrun falls back to the deterministic template writer.
+    STAGE_DEADLINES: dict[str, float] = {
+        "spec": float(os.getenv("STAGE_DEADLINE_SPEC", "600")),
+        "codegen": float(os.getenv("STAGE_DEADLINE_CODEGEN", "900")),
+        "deps": float(os.getenv("STAGE_DEADLINE_DEPS", "600")),
+        "run": float(os.getenv("STAGE_DEADLINE_RUN", "300")),
+        "repair": float(os.getenv("STAGE_DEADLINE_REPAIR", "600")),
+    }
+    RUN_BUDGET_SECONDS: float = float(os.getenv("RUN_BUDGET_SECONDS", "3600"))
+
+    # Packages installed into the sandbox venv while the LLM stages run
+    SANDBOX_BASE_PACKAGES: list[str] = [
+        p.strip() for p in os.getenv("SANDBOX_BASE_PACKAGES", "fastapi,uvicorn").split(",") if p.strip()
+    ]
+
+    # Pre-warmed venvs with the base packages (0 disables the pool): refilled up to
+    # VENV_POOL_SIZE once ready + building drops to the low-water mark
+    VENV_POOL_SIZE: int = int(os.getenv("VENV_POOL_SIZE", "2"))
+    VENV_POOL_LOW_WATER: int = int(os.getenv("VENV_POOL_LOW_WATER", "1"))
+    VENV_POOL_REFILL_CONCURRENCY: int = int(os.getenv("VENV_POOL_REFILL_CONCURRENCY", "1"))
+
+    # Run executor: max runs in flight + per-stage concurrency
+    RUN_MAX_ACTIVE: int = int(os.getenv("RUN_MAX_ACTIVE", "32"))
+    POOL_LLM_SIZE: int = int(os.getenv("POOL_LLM_SIZE", "4"))
+    POOL_DEPS_SIZE: int = int(os.getenv("POOL_DEPS_SIZE", "4"))
+    POOL_SANDBOX_SIZE: int = int(os.getenv("POOL_SANDBOX_SIZE", "8"))
+
+    # Durable run queue (leases + heartbeats)
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_HEARTBEAT_SECONDS: int = int(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
 
 settings = Settings()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+import json
+from typing import Any, Collection, Dict, List, Optional
+
+
+class JsonStreamError(ValueError):
+    """
+    The streamed text cannot be (or can no longer become) the expected JSON object.
+    """
+
+
+def model_keys(model: Any) -> Optional[set]:
+    """
+    Keys to enforce while streaming into a pydantic model: its fields if it forbids
+    extras, otherwise None, since validation would ignore unknown keys anyway.
+    """
+    if model.model_config.get("extra") == "forbid":
+        return set(model.model_fields)
+    return None
+
+
+class _Frame:
+    __slots__ = ("kind", "expect_key", "key")
+
+    def __init__(self, kind: str):
+        self.kind = kind            # "{" or "["
+        self.expect_key = kind == "{"
+        self.key: Optional[str] = None
+
+
+class JsonObjectStream:
+    """
+    Incremental scanner for one top-level JSON object that arrives in chunks.
+
+    - Skips anything before the first "{" (prose, markdown fences) and after the
+      object closes.
+    - Tracks nesting and string/escape state across chunk boundaries.
+    - If `stream_key` is set, the elements of that top-level array are handed back
+      by feed() as soon as each one closes and are NOT kept in the document buffer,
+      so memory is bounded by the largest element instead of the whole response.
+    - If `allowed_keys` / `element_keys` are set, an unexpected top-level key (or
+      key inside a streamed element) raises JsonStreamError as soon as it is read,
+      so the caller can abort the LLM request instead of waiting for the end.
+    """
+    def __init__(
+        self,
+        stream_key: Optional[str] = None,
+        allowed_keys: Optional[Collection[str]] = None,
+        element_keys: Optional[Collection[str]] = None,
+    ):
+        self.stream_key = stream_key
+        self.allowed_keys = set(allowed_keys) if allowed_keys is not None else None
+        self.element_keys = set(element_keys) if element_keys is not None else None
+        self._expect_array = False
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None
+        self._doc: List[str] = []              # document minus streamed elements
+        self._element: Optional[List[str]] = None
+        self._element_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def _streaming_array(self) -> bool:
+        return (
+            len(self._stack) == 2
+            and self._stack[1].kind == "["
+            and self._stack[0].key == self.stream_key
+            and self.stream_key is not None
+        )
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Consume a chunk; return the raw JSON text of every streamed element it completed.
+        """
+        completed: List[str] = []
+        for ch in chunk:
+            if self._done:
+                break
+            if not self._started:
+                # Any amount of preamble (fences, prose, reasoning output) is skipped
+                if ch != "{":
+                    continue
+                self._started = True
+
+            if not self._in_string and not ch.isspace():
+                self._check_shape(ch)
+
+            if self._element is not None:
+                self._element.append(ch)
+            elif not self._streaming_array() or ch in "[]":
+                self._doc.append(ch)
+
+            if self._in_string:
+                if self._key_chars is not None:
+                    self._key_chars.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._on_key(json.loads('"' + "".join(self._key_chars)))
+                        self._key_chars = None
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                top = self._stack[-1] if self._stack else None
+                if top is not None and top.kind == "{" and top.expect_key:
+                    self._key_chars = []
+            elif ch in "{[":
+                if ch == "{" and self._element is None and self._streaming_array():
+                    self._element = [ch]
+                    self._element_depth = len(self._stack)
+                self._stack.append(_Frame(ch))
+            elif ch in "}]":
+                if not self._stack or self._stack[-1].kind != ("{" if ch == "}" else "["):
+                    raise JsonStreamError(f"Unbalanced '{ch}' in stream")
+                self._stack.pop()
+                if self._element is not None and len(self._stack) == self._element_depth:
+                    completed.append("".join(self._element))
+                    self._element = None
+                if not self._stack:
+                    self._done = True
+            elif ch == ":":
+                if self._stack and self._stack[-1].kind == "{":
+                    self._stack[-1].expect_key = False
+            elif ch == ",":
+                if self._stack and self._stack[-1].kind == "{":
+                    self._stack[-1].expect_key = True
+        return completed
+
+    def _check_shape(self, ch: str) -> None:
+        if self._expect_array:
+            self._expect_array = False
+            if ch != "[":
+                raise JsonStreamError(f'"{self.stream_key}" must be an array')
+        if self._element is None and self._streaming_array() and ch not in "{,]":
+            raise JsonStreamError(f'"{self.stream_key}" entries must be objects')
+        if ch == ":" and len(self._stack) == 1 and self._stack[0].key == self.stream_key:
+            self._expect_array = self.stream_key is not None
+
+    def _on_key(self, key: str) -> None:
+        self._stack[-1].key = key
+        depth = len(self._stack)
+        if depth == 1 and self.allowed_keys is not None and key not in self.allowed_keys:
+            raise JsonStreamError(f"Unexpected top-level key: {key!r}")
+        if (
+            self._element is not None
+            and depth == self._element_depth + 1
+            and self.element_keys is not None
+            and key not in self.element_keys
+        ):
+            raise JsonStreamError(f'Unexpected key in "{self.stream_key}" entry: {key!r}')
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finish the stream and return the parsed document
+        (the streamed array, if any, is left empty).
+        """
+        if not self._started:
+            raise JsonStreamError("No JSON object found in output")
+        if not self._done:
+            raise JsonStreamError("Output ended before the JSON object was closed")
+        try:
+            return json.loads("".join(self._doc), strict=False)
+        except ValueError as e:
+            raise JsonStreamError(f"Invalid JSON: {e}") from e
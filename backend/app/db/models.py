@@ -10,7 +10,7 @@ class Project(SQLModel, table=True):
 class Run(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     project_id: int = Field(index=True)
-    status: str = Field(default="queued")  # queued | running | success | failed
+    status: str = Field(default="queued")  # queued | running | success | failed | cancelled
     entrypoint: str = Field(default="main.py")
     attempts: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -22,3 +22,56 @@ class LogEvent(SQLModel, table=True):
     level: str = Field(default="INFO")  # INFO | ERROR
     message: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RunJob(SQLModel, table=True):
+    """
+    Durable queue entry for a run. Workers claim jobs with a time-limited lease
+    and renew it with heartbeats; an expired lease makes the job claimable again.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(index=True)
+    prompt: str
+    from_stage: Optional[str] = Field(default=None)  # None = resume after last checkpoint
+    status: str = Field(default="queued", index=True)  # queued | leased | done | failed | cancelled
+    lease_owner: Optional[str] = Field(default=None)
+    lease_expires_at: Optional[datetime] = Field(default=None)
+    heartbeat_at: Optional[datetime] = Field(default=None)
+    attempts: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RunCheckpoint(SQLModel, table=True):
+    """
+    Output of a completed pipeline stage (spec: TaskSpec JSON, codegen: GenOutput JSON).
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(index=True)
+    stage: str
+    payload: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class AppProcess(SQLModel, table=True):
+    """
+    A generated app that is up and serving, so previews can be found (and
+    re-adopted) across backend restarts.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(index=True, unique=True)
+    pid: int
+    port: int = Field(index=True)
+    log_path: str
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RepairCacheEntry(SQLModel, table=True):
+    """
+    A repair that fixed a given error signature, stored as context-anchored edits
+    (JSON list of {path, old, new}) so it can be replayed on a later run.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    fingerprint: str = Field(index=True, unique=True)
+    signature: str
+    edits: str
+    hits: int = 0
+    successes: int = 0
+    failures: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow)
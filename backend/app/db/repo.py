@@ -1,5 +1,7 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_, update
 from sqlmodel import Session, select
-from app.db.models import Project, Run, LogEvent
+from app.db.models import Project, Run, LogEvent, RunJob, RunCheckpoint, AppProcess, RepairCacheEntry
 
 def create_project(session: Session, name: str) -> Project:
     p = Project(name=name)
@@ -43,3 +45,215 @@ def add_log(session: Session, run_id: int, stage: str, level: str, message: str)
 def list_logs(session: Session, run_id: int) -> list[LogEvent]:
     stmt = select(LogEvent).where(LogEvent.run_id == run_id).order_by(LogEvent.id)
     return list(session.exec(stmt).all())
+
+def enqueue_job(session: Session, run_id: int, prompt: str, from_stage: str | None = None) -> RunJob:
+    j = RunJob(run_id=run_id, prompt=prompt, from_stage=from_stage, status="queued")
+    session.add(j)
+    session.commit()
+    session.refresh(j)
+    return j
+
+def get_latest_job(session: Session, run_id: int) -> RunJob | None:
+    stmt = select(RunJob).where(RunJob.run_id == run_id).order_by(RunJob.id.desc()).limit(1)
+    return session.exec(stmt).first()
+
+def count_jobs(session: Session, status: str) -> int:
+    stmt = select(func.count()).select_from(RunJob).where(RunJob.status == status)
+    return session.exec(stmt).one()
+
+def _claimable(now: datetime):
+    return or_(
+        RunJob.status == "queued",
+        and_(RunJob.status == "leased", RunJob.lease_expires_at < now),
+    )
+
+def claim_job(session: Session, owner: str, lease_seconds: int) -> RunJob | None:
+    """
+    Claim the oldest queued job, or one whose lease has expired.
+    The conditional UPDATE makes the claim atomic across workers.
+    """
+    now = datetime.utcnow()
+    stmt = select(RunJob).where(_claimable(now)).order_by(RunJob.id).limit(1)
+    job = session.exec(stmt).first()
+    if job is None:
+        return None
+
+    claimed = session.exec(
+        update(RunJob)
+        .where(RunJob.id == job.id, _claimable(now))
+        .values(
+            status="leased",
+            lease_owner=owner,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now,
+            attempts=RunJob.attempts + 1,
+        )
+    )
+    session.commit()
+    if claimed.rowcount != 1:
+        return None  # another worker won the race
+    session.refresh(job)
+    return job
+
+def heartbeat_job(session: Session, job_id: int, owner: str, lease_seconds: int) -> bool:
+    """
+    Extend the lease. Returns False if this worker no longer owns the job.
+    """
+    now = datetime.utcnow()
+    renewed = session.exec(
+        update(RunJob)
+        .where(RunJob.id == job_id, RunJob.status == "leased", RunJob.lease_owner == owner)
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+    )
+    session.commit()
+    return renewed.rowcount == 1
+
+def finish_job(session: Session, job_id: int, owner: str, status: str) -> None:
+    session.exec(
+        update(RunJob)
+        .where(RunJob.id == job_id, RunJob.lease_owner == owner)
+        .values(status=status, lease_expires_at=None)
+    )
+    session.commit()
+
+def cancel_jobs(session: Session, run_id: int) -> int:
+    """
+    Mark the run's pending/in-flight jobs cancelled. A worker holding the lease
+    notices on its next heartbeat and stops the run.
+    """
+    res = session.exec(
+        update(RunJob)
+        .where(RunJob.run_id == run_id, RunJob.status.in_(["queued", "leased"]))
+        .values(status="cancelled", lease_expires_at=None)
+    )
+    session.commit()
+    return res.rowcount
+
+def release_job(session: Session, job_id: int, owner: str) -> None:
+    """
+    Hand a leased job back to the queue (e.g. on graceful shutdown).
+    A clean hand-back does not count against the job's attempts.
+    """
+    session.exec(
+        update(RunJob)
+        .where(RunJob.id == job_id, RunJob.status == "leased", RunJob.lease_owner == owner)
+        .values(status="queued", lease_owner=None, lease_expires_at=None, attempts=RunJob.attempts - 1)
+    )
+    session.commit()
+
+def save_checkpoint(session: Session, run_id: int, stage: str, payload: str) -> RunCheckpoint:
+    """
+    Upsert: one checkpoint per (run, stage), the latest output wins.
+    """
+    c = get_checkpoint(session, run_id, stage)
+    if c is None:
+        c = RunCheckpoint(run_id=run_id, stage=stage, payload=payload)
+    else:
+        c.payload = payload
+        c.created_at = datetime.utcnow()
+    session.add(c)
+    session.commit()
+    session.refresh(c)
+    return c
+
+def get_checkpoint(session: Session, run_id: int, stage: str) -> RunCheckpoint | None:
+    stmt = select(RunCheckpoint).where(RunCheckpoint.run_id == run_id, RunCheckpoint.stage == stage)
+    return session.exec(stmt).first()
+
+def save_app_process(
+    session: Session, run_id: int, pid: int, port: int, log_path: str, started_at: datetime
+) -> AppProcess:
+    p = get_app_process(session, run_id)
+    if p is None:
+        p = AppProcess(run_id=run_id, pid=pid, port=port, log_path=log_path, started_at=started_at)
+    else:
+        p.pid, p.port, p.log_path, p.started_at = pid, port, log_path, started_at
+    session.add(p)
+    session.commit()
+    session.refresh(p)
+    return p
+
+def get_app_process(session: Session, run_id: int) -> AppProcess | None:
+    stmt = select(AppProcess).where(AppProcess.run_id == run_id)
+    return session.exec(stmt).first()
+
+def list_app_processes(session: Session) -> list[AppProcess]:
+    return list(session.exec(select(AppProcess)).all())
+
+def delete_app_process(session: Session, run_id: int) -> None:
+    p = get_app_process(session, run_id)
+    if p is not None:
+        session.delete(p)
+        session.commit()
+
+def get_repair_entry(session: Session, fingerprint: str) -> RepairCacheEntry | None:
+    stmt = select(RepairCacheEntry).where(RepairCacheEntry.fingerprint == fingerprint)
+    return session.exec(stmt).first()
+
+def save_repair_entry(session: Session, fingerprint: str, signature: str, edits: str) -> RepairCacheEntry:
+    """
+    Upsert: the latest successful repair for a fingerprint wins.
+    """
+    e = get_repair_entry(session, fingerprint)
+    if e is None:
+        e = RepairCacheEntry(fingerprint=fingerprint, signature=signature, edits=edits)
+    else:
+        e.signature, e.edits, e.failures = signature, edits, 0
+    e.last_used_at = datetime.utcnow()
+    session.add(e)
+    session.commit()
+    session.refresh(e)
+    return e
+
+def record_repair_hit(session: Session, entry: RepairCacheEntry) -> None:
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    session.add(entry)
+    session.commit()
+
+def record_repair_outcome(session: Session, entry: RepairCacheEntry, ok: bool) -> None:
+    if ok:
+        entry.successes += 1
+    else:
+        entry.failures += 1
+    session.add(entry)
+    session.commit()
+
+def evict_repair_entries(session: Session, max_entries: int) -> int:
+    """
+    Drop entries that fail more often than they help, then the least recently
+    used ones beyond max_entries. Returns how many were removed.
+    """
+    removed = 0
+    stale = session.exec(
+        select(RepairCacheEntry).where(
+            RepairCacheEntry.failures >= 2,
+            RepairCacheEntry.failures > RepairCacheEntry.successes,
+        )
+    ).all()
+    for e in stale:
+        session.delete(e)
+        removed += 1
+    session.commit()
+
+    count = session.exec(select(func.count()).select_from(RepairCacheEntry)).one()
+    if count > max_entries:
+        oldest = session.exec(
+            select(RepairCacheEntry).order_by(RepairCacheEntry.last_used_at).limit(count - max_entries)
+        ).all()
+        for e in oldest:
+            session.delete(e)
+            removed += 1
+        session.commit()
+    return removed
+
+def repair_cache_totals(session: Session) -> dict:
+    row = session.exec(
+        select(
+            func.count(RepairCacheEntry.id),
+            func.coalesce(func.sum(RepairCacheEntry.hits), 0),
+            func.coalesce(func.sum(RepairCacheEntry.successes), 0),
+            func.coalesce(func.sum(RepairCacheEntry.failures), 0),
+        )
+    ).one()
+    return {"entries": row[0], "hits": row[1], "successes": row[2], "failures": row[3]}
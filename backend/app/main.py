@@ -1,6 +1,7 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from typing import Literal
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse
 from sqlmodel import Session
 import shutil
 import os
@@ -8,7 +9,14 @@ import os
 from app.db.database import init_db, get_session, engine
 from app.db import repo
 from app.core.schemas import CreateProjectRequest, CreateRunRequest, RunStatusResponse
-from app.services.orchestrator import Orchestrator
+from app.services.orchestrator import Orchestrator, REQUIRED_CHECKPOINT
+from app.services.preview_manager import PreviewError
+from app.services.preview_host import HostedApp
+from app.services.preview_proxy import PreviewProxy, preview_prefix
+from app.services.executor import RunExecutor
+from app.services.run_queue import RunQueueWorker
+from app.services.logging_service import log
+from app.db.models import RunJob
 from app.services.workspace import project_workspace
 
 app = FastAPI(title="Prompt2Product Backend (MVP)")
@@ -22,25 +30,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-orch = Orchestrator()
+executor = RunExecutor()
+orch = Orchestrator(executor)
+proxy = PreviewProxy()
 from dotenv import load_dotenv
 load_dotenv()
 
-@app.on_event("startup")
-def on_startup():
-    init_db()
-
-def run_project_generation(run_id: int, prompt: str):
+async def run_project_generation(job: RunJob):
     """
-    Background task wrapper to handle DB session independently.
+    Queue job handler; handles the DB session independently.
+    Being a coroutine, it runs on the server's event loop instead of the threadpool.
     """
     with Session(engine) as session:
         # Re-fetch run to ensure it's attached to this session if needed, 
         # but execute_run takes the run object. 
         # Better to fetch it freshly.
-        run = repo.get_run(session, run_id)
+        run = repo.get_run(session, job.run_id)
         if run:
-            orch.execute_run(session, run, prompt)
+            if job.attempts > 1:
+                log(session, run.id, "queue", f"Resuming interrupted run (attempt {job.attempts})")
+            await orch.execute_run(session, run, job.prompt, from_stage=job.from_stage)
+
+worker = RunQueueWorker(executor, run_project_generation)
+
+@app.on_event("startup")
+async def on_startup():
+    init_db()
+    await orch.previews.adopt()
+    orch.previews.start_reaper()
+    orch.venv_pool.start()
+    worker.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await worker.stop()
+    await proxy.aclose()
+    await orch.aclose()
 
 @app.post("/projects")
 def create_project(payload: CreateProjectRequest, session: Session = Depends(get_session)):
@@ -52,10 +77,9 @@ def list_projects(session: Session = Depends(get_session)):
     return repo.list_projects(session)
 
 @app.post("/projects/{project_id}/runs", response_model=RunStatusResponse)
-def start_run(
+async def start_run(
     project_id: int, 
     payload: CreateRunRequest, 
-    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session)
 ):
     p = repo.get_project(session, project_id)
@@ -64,8 +88,9 @@ def start_run(
 
     run = repo.create_run(session, project_id, entrypoint=payload.entrypoint)
 
-    # Run in background
-    background_tasks.add_task(run_project_generation, run.id, payload.prompt)
+    # Persist the job; the queue worker feeds it to the run executor
+    repo.enqueue_job(session, run.id, payload.prompt)
+    worker.notify()
 
     return RunStatusResponse(run_id=run.id, status=run.status, attempts=run.attempts)
 
@@ -74,7 +99,106 @@ def get_run(run_id: int, session: Session = Depends(get_session)):
     r = repo.get_run(session, run_id)
     if not r:
         raise HTTPException(status_code=404, detail="Run not found")
-    return r
+    proc = repo.get_app_process(session, run_id)
+    return {**r.model_dump(), "port": proc.port if proc else None}
+
+@app.post("/runs/{run_id}/retry", response_model=RunStatusResponse)
+async def retry_run(
+    run_id: int,
+    from_stage: Literal["codegen", "deps", "run"] = "codegen",
+    session: Session = Depends(get_session)
+):
+    r = repo.get_run(session, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if r.status in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Run is already {r.status}")
+
+    needed = REQUIRED_CHECKPOINT[from_stage]
+    if repo.get_checkpoint(session, run_id, needed) is None:
+        raise HTTPException(status_code=409, detail=f"No {needed} checkpoint to resume from")
+
+    job = repo.get_latest_job(session, run_id)
+    r = repo.update_run_status(session, r, "queued")
+    repo.enqueue_job(session, run_id, job.prompt if job else "", from_stage=from_stage)
+    worker.notify()
+
+    return RunStatusResponse(run_id=r.id, status=r.status, attempts=r.attempts)
+
+@app.post("/runs/{run_id}/cancel", response_model=RunStatusResponse)
+async def cancel_run(run_id: int, session: Session = Depends(get_session)):
+    r = repo.get_run(session, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if r.status not in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Run is already {r.status}")
+
+    # Durable first, so a worker in another process stops on its next heartbeat
+    repo.cancel_jobs(session, run_id)
+    orch.cancel(r)
+    r = repo.update_run_status(session, r, "cancelled")
+    log(session, run_id, "cancel", "Run cancelled by user")
+
+    return RunStatusResponse(run_id=r.id, status=r.status, attempts=r.attempts)
+
+async def ensure_preview(run_id: int):
+    """
+    Live app for a run, started first if it was scaled to zero.
+    The DB is only consulted on a cold start, not on every proxied request.
+    """
+    entry = orch.previews.lookup(run_id)
+    if entry is not None:
+        return entry
+
+    with Session(engine) as session:
+        r = repo.get_run(session, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if r.status != "success":
+        raise HTTPException(status_code=409, detail=f"Run is {r.status}, nothing to preview")
+
+    ws = project_workspace(r.project_id, run_id)
+    try:
+        return await orch.previews.ensure(run_id, ws, ws / "generated_app" / "backend")
+    except PreviewError as e:
+        raise HTTPException(status_code=503, detail=str(e)[-2000:])
+
+@app.post("/runs/{run_id}/preview")
+async def start_preview(run_id: int):
+    entry = await ensure_preview(run_id)
+    return {"run_id": run_id, "port": entry.port, "url": preview_prefix(run_id) + "/"}
+
+@app.delete("/runs/{run_id}/preview")
+def stop_preview(run_id: int):
+    return {"run_id": run_id, "stopped": orch.previews.stop(run_id)}
+
+@app.get("/preview/{run_id}", include_in_schema=False)
+def preview_root(run_id: int):
+    return RedirectResponse(preview_prefix(run_id) + "/")
+
+@app.api_route(
+    "/preview/{run_id}/{path:path}",
+    methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+    include_in_schema=False,
+)
+async def preview_proxy(run_id: int, path: str, request: Request):
+    entry = await ensure_preview(run_id)
+    if isinstance(entry, HostedApp):
+        return await proxy.forward(request, run_id, path, str(entry.client.base_url).rstrip("/"), client=entry.client)
+    return await proxy.forward(request, run_id, path, f"http://127.0.0.1:{entry.port}")
+
+@app.get("/executor/stats")
+def executor_stats(session: Session = Depends(get_session)):
+    stats = executor.stats()
+    stats["jobs_queued"] = repo.count_jobs(session, "queued")
+    stats["jobs_leased"] = repo.count_jobs(session, "leased")
+    stats["previews"] = orch.previews.stats()
+    stats["venv_pool"] = orch.venv_pool.stats()
+    return stats
+
+@app.get("/repair-cache/stats")
+def repair_cache_stats(session: Session = Depends(get_session)):
+    return orch.repair_cache.stats(session)
 
 @app.get("/runs/{run_id}/logs")
 def get_logs(run_id: int, session: Session = Depends(get_session)):
@@ -0,0 +1,233 @@
+from __future__ import annotations
+import ast
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from app.services.code_generator import strip_version_pins
+from app.services.preflight import BACKEND_DIR, IMPORT_NAMES, REQUIREMENTS
+from app.services.sandbox.venv_runner import normalize_requirement_name
+
+APP_ROOT = "generated_app"
+
+# Import name -> distribution, where they differ
+DISTRIBUTIONS = {name: dist for dist, names in IMPORT_NAMES.items() for name in names}
+
+_MISSING_MODULE = [
+    re.compile(r"No module named '([\w.]+)'"),
+    re.compile(r"imports '([\w.]+)', which is not in requirements\.txt"),
+    re.compile(r'requires "([\w.-]+)" to be installed'),
+]
+_STATIC_DIR = [
+    re.compile(r"StaticFiles directory does not exist: (\S+)"),
+    re.compile(r"Directory '([^']+)' does not exist"),
+]
+_APP_ENTRY = re.compile(
+    r'Could not import module "main"'
+    r'|Attribute "app" not found in module "main"'
+    r"|module 'main' has no attribute 'app'"
+    r"|No module named 'main'"
+    r"|backend/main\.py: file is missing"
+)
+_PIN_FAILURE = re.compile(
+    r"Could not find a version that satisfies the requirement"
+    r"|No matching distribution found for"
+    r"|ResolutionImpossible"
+    r"|conflicting dependencies"
+)
+_APP_FACTORIES = {"FastAPI", "Starlette"}
+
+
+@dataclass
+class FixResult:
+    fixer: str
+    applied: bool
+    detail: str = ""
+
+
+Fixer = Callable[[Path, str], FixResult]
+
+
+def _inside_app(ws: Path, path: Path) -> bool:
+    root = (ws / APP_ROOT).resolve()
+    path = path.resolve()
+    return path == root or root in path.parents
+
+
+def _requirement_names(text: str) -> set[str]:
+    names = set()
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line and not line.startswith("-"):
+            names.add(normalize_requirement_name(line))
+    return names
+
+
+def fix_missing_module(ws: Path, error: str) -> FixResult:
+    """
+    Add third-party modules the app imports (or FastAPI asks for) to requirements.txt;
+    the run loop reinstalls whenever that file changes.
+    """
+    backend = ws / BACKEND_DIR
+    local = {p.stem for p in backend.glob("*.py")} | {p.name for p in backend.iterdir() if p.is_dir()} if backend.is_dir() else set()
+    req = ws / REQUIREMENTS
+    text = req.read_text(encoding="utf-8") if req.exists() else ""
+    listed = _requirement_names(text)
+
+    added: List[str] = []
+    for pattern in _MISSING_MODULE:
+        for m in pattern.finditer(error):
+            top = m.group(1).split(".")[0]
+            if top in local or top in sys.stdlib_module_names or top == "main":
+                continue
+            dist = DISTRIBUTIONS.get(top, top)
+            if normalize_requirement_name(dist) in listed | {normalize_requirement_name(a) for a in added}:
+                continue
+            added.append(dist)
+    if not added:
+        return FixResult("missing_module", False)
+
+    if text and not text.endswith("\n"):
+        text += "\n"
+    req.parent.mkdir(parents=True, exist_ok=True)
+    req.write_text(text + "".join(f"{d}\n" for d in added), encoding="utf-8")
+    return FixResult("missing_module", True, f"added {', '.join(added)} to requirements.txt")
+
+
+def fix_static_dir(ws: Path, error: str) -> FixResult:
+    """
+    Create the directory a StaticFiles mount points at (inside the generated app only).
+    """
+    backend = ws / BACKEND_DIR
+    created: List[str] = []
+    for pattern in _STATIC_DIR:
+        for m in pattern.finditer(error):
+            raw = Path(m.group(1))
+            # Pre-flight shows workspace-relative paths; Starlette shows what the app passed
+            if raw.is_absolute():
+                target = raw
+            elif raw.parts[:1] == (APP_ROOT,):
+                target = ws / raw
+            else:
+                target = backend / raw
+            if not _inside_app(ws, target) or target.exists():
+                continue
+            target.mkdir(parents=True, exist_ok=True)
+            created.append(target.resolve().relative_to(ws.resolve()).as_posix())
+    if not created:
+        return FixResult("static_dir", False)
+    return FixResult("static_dir", True, f"created {', '.join(created)}")
+
+
+def _app_instances(tree: ast.Module) -> List[str]:
+    """
+    Module-level names bound to FastAPI(...) / Starlette(...).
+    """
+    names = []
+    for node in tree.body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and isinstance(node.value, ast.Call):
+            func = node.value.func
+            factory = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if factory in _APP_FACTORIES:
+                names += [t.id for t in targets if isinstance(t, ast.Name)]
+    return names
+
+
+def _binds(tree: ast.Module, name: str) -> bool:
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == name for t in node.targets):
+            return True
+        if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.target.id == name:
+            return True
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and any((a.asname or a.name) == name for a in node.names):
+            return True
+    return False
+
+
+def _parse(path: Path) -> Optional[ast.Module]:
+    try:
+        return ast.parse(path.read_text(encoding="utf-8"))
+    except (SyntaxError, UnicodeDecodeError, OSError):
+        return None
+
+
+def _find_app(backend: Path) -> Optional[Tuple[str, str]]:
+    """
+    (module, name) of an app instance defined somewhere else in the backend.
+    """
+    for file in sorted(backend.rglob("*.py")):
+        rel = file.relative_to(backend)
+        if file.name == "main.py" and len(rel.parts) == 1:
+            continue
+        if any(part.startswith(".") for part in rel.parts):
+            continue
+        tree = _parse(file)
+        names = _app_instances(tree) if tree is not None else []
+        if names:
+            module = ".".join(rel.with_suffix("").parts)
+            return module, ("app" if "app" in names else names[0])
+    return None
+
+
+def fix_app_entry(ws: Path, error: str) -> FixResult:
+    """
+    The app is always served as main:app. Expose the app under that name when it
+    is called something else or lives in another module.
+    """
+    if not _APP_ENTRY.search(error):
+        return FixResult("app_entry", False)
+    backend = ws / BACKEND_DIR
+    main = backend / "main.py"
+    if main.exists():
+        tree = _parse(main)
+        if tree is None:
+            return FixResult("app_entry", False)
+        if _binds(tree, "app"):
+            return FixResult("app_entry", False)
+        names = _app_instances(tree)
+        if names:
+            line = f"app = {names[0]}"
+        else:
+            found = _find_app(backend)
+            if found is None:
+                return FixResult("app_entry", False)
+            line = f"from {found[0]} import {found[1]} as app"
+        text = main.read_text(encoding="utf-8")
+        main.write_text(text.rstrip("\n") + f"\n\n{line}\n", encoding="utf-8")
+        return FixResult("app_entry", True, f"added '{line}' to main.py")
+
+    found = _find_app(backend)
+    if found is None:
+        return FixResult("app_entry", False)
+    line = f"from {found[0]} import {found[1]} as app"
+    main.write_text(line + "\n", encoding="utf-8")
+    return FixResult("app_entry", True, f"created main.py with '{line}'")
+
+
+def fix_version_pins(ws: Path, error: str) -> FixResult:
+    """
+    Unpin requirements.txt when pip cannot satisfy a pinned version.
+    """
+    req = ws / REQUIREMENTS
+    if not _PIN_FAILURE.search(error) or not req.exists():
+        return FixResult("version_pins", False)
+    text = req.read_text(encoding="utf-8")
+    unpinned = strip_version_pins(text)
+    if unpinned == text:
+        return FixResult("version_pins", False)
+    req.write_text(unpinned, encoding="utf-8")
+    changed = [a.strip() for a, b in zip(text.splitlines(), unpinned.splitlines()) if a != b]
+    return FixResult("version_pins", True, f"unpinned {', '.join(changed)}")
+
+
+FIXERS: List[Fixer] = [fix_missing_module, fix_static_dir, fix_app_entry, fix_version_pins]
+
+
+def autofix(ws: Path, error: str) -> List[FixResult]:
+    """
+    Run every rule against the error text; each one reports whether it changed anything.
+    """
+    return [fixer(ws, error) for fixer in FIXERS]
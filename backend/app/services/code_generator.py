@@ -1,7 +1,12 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+import json
+import re
+from contextlib import aclosing
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from pydantic import BaseModel, Field
-from app.services.llm.base import LLMClient
+from app.core.config import settings
+from app.core.json_stream import JsonObjectStream, model_keys
+from app.services.llm.base import LLMClient, guarded_stream
 from app.services.prompt_to_spec import TaskSpec
 
 class GenFile(BaseModel):
@@ -40,33 +45,111 @@ IMPORTANT: Escape all special characters in "content" strings properly (e.g. quo
 Do NOT include comments (// or #) inside the JSON.
 """
 
-from app.core.utils import extract_json
 
-async def llm_spec_to_code(llm: LLMClient, model: str, spec: TaskSpec) -> GenOutput:
+_VERSION_SPEC = re.compile(
+    r"\s*(?:===|==|~=|!=|<=|>=|<|>)\s*[^\s,;#]+(?:\s*,\s*(?:===|==|~=|!=|<=|>=|<|>)\s*[^\s,;#]+)*"
+)
+
+
+def strip_version_pins(text: str) -> str:
+    """
+    "pkg==1.2.3", "pkg>=1.2,<2" -> "pkg". Comments, environment markers,
+    pip options and URL requirements are left alone.
+    """
+    lines = []
+    for line in text.splitlines(keepends=True):
+        if line.lstrip().startswith(("-", "#")) or "://" in line:
+            lines.append(line)
+            continue
+        cut = min((i for i in (line.find(";"), line.find("#")) if i != -1), default=len(line))
+        lines.append(_VERSION_SPEC.sub("", line[:cut], count=1) + line[cut:])
+    return "".join(lines)
+
+
+def _postprocess_file(file: GenFile) -> GenFile:
+    """
+    Fix common LLM escaping issues (like double \\n) and strip version pins.
+    """
+    if "\\n" in file.content:
+        file.content = file.content.replace("\\n", "\n")
+
+    if file.path.endswith("requirements.txt"):
+        # Safety net: remove version pins if LLM ignored instructions
+        file.content = strip_version_pins(file.content)
+    return file
+
+
+class GenOutputStream:
+    """
+    Incremental parser for the {"files":[{path,content}...], ...} reply.
+    Each GenFile is validated and returned by feed() as soon as its object closes,
+    so a malformed entry fails without waiting for the rest of the reply. Unknown
+    keys are rejected only where the models forbid them.
+    """
+    def __init__(self):
+        self._scanner = JsonObjectStream(
+            stream_key="files",
+            allowed_keys=model_keys(GenOutput),
+            element_keys=model_keys(GenFile),
+        )
+        self.files: List[GenFile] = []
+
+    @property
+    def done(self) -> bool:
+        return self._scanner.done
+
+    def feed(self, chunk: str) -> List[GenFile]:
+        new_files = []
+        for raw in self._scanner.feed(chunk):
+            f = _postprocess_file(GenFile.model_validate(json.loads(raw, strict=False)))
+            self.files.append(f)
+            new_files.append(f)
+        return new_files
+
+    def close(self) -> GenOutput:
+        doc = self._scanner.close()
+        doc["files"] = []
+        output = GenOutput.model_validate(doc)
+        output.files = self.files
+        return output
+
+
+OnFile = Callable[[GenFile], Awaitable[None]]
+OnRetry = Callable[[], Awaitable[None]]
+
+
+async def _stream_code(llm: LLMClient, model: str, system: str, user: str, on_file: Optional[OnFile]) -> GenOutput:
+    parser = GenOutputStream()
+    stream = guarded_stream(llm, model, system, user, settings.LLM_FIRST_TOKEN_SECONDS, settings.LLM_STALL_SECONDS)
+    async with aclosing(stream):
+        async for chunk in stream:
+            for f in parser.feed(chunk):
+                if on_file is not None:
+                    await on_file(f)
+            if parser.done:
+                break  # don't pay for trailing tokens after the object closed
+    return parser.close()
+
+
+async def llm_spec_to_code(
+    llm: LLMClient,
+    model: str,
+    spec: TaskSpec,
+    on_file: Optional[OnFile] = None,
+    on_retry: Optional[OnRetry] = None,
+) -> GenOutput:
+    """
+    Streams the code model's reply; `on_file` is awaited for every file as soon
+    as it is complete, before the model has finished the rest. A schema violation
+    or a stalled stream cancels the request and goes straight to the retry;
+    `on_retry` is awaited first, to discard what the failed attempt produced.
+    """
     user = f"TASKSPEC_JSON:\n{spec.model_dump_json(indent=2)}\n\nReturn code files JSON only."
-    raw = await llm.chat(model=model, system=SYSTEM_CODE, user=user)
-    
-    cleaned = extract_json(raw)
-    
+
     try:
-        output = GenOutput.model_validate_json(cleaned)
+        return await _stream_code(llm, model, SYSTEM_CODE, user, on_file)
     except Exception as e:
         fix_system = f"{SYSTEM_CODE}\n\nYour previous output had validation errors:\n{str(e)}\n\nOutput ONLY corrected JSON."
-        raw2 = await llm.chat(model=model, system=fix_system, user=user)
-        cleaned2 = extract_json(raw2)
-        output = GenOutput.model_validate_json(cleaned2)
-
-    # Post-process to fix common LLM escaping issues (like double \\n in requirements.txt)
-    # Post-process to fix common LLM escaping issues (like double \\n)
-    import re
-    for file in output.files:
-        if "\\n" in file.content:
-            file.content = file.content.replace("\\n", "\n")
-        
-        if file.path.endswith("requirements.txt"):
-            # Safety net: remove version pins if LLM ignored instructions
-            # Replace "pkg==1.2.3" or "pkg>=1.2" with "pkg"
-            file.content = re.sub(r"==[^\s]+", "", file.content)
-            file.content = re.sub(r">=[^\s]+", "", file.content)
-            
-    return output
+        if on_retry is not None:
+            await on_retry()
+        return await _stream_code(llm, model, fix_system, user, on_file)
@@ -1,10 +1,17 @@
 # app/services/code_writer.py
 from __future__ import annotations
 
-from typing import Dict, List
+import re
+from typing import Dict, List, Tuple
 
 from app.services.prompt_to_spec import TaskSpec, ApiSpec, PageSpec
 
+# APIs the backend template actually implements
+TEMPLATE_APIS = {("GET", "/api/menu"), ("POST", "/api/order")}
+
+# Routes must turn into valid function names (page_<slug>) and file names
+_TEMPLATE_ROUTE = re.compile(r"^/(?:[A-Za-z0-9_]+(?:/[A-Za-z0-9_]+)*)?$")
+
 
 def _nav_links(spec: TaskSpec) -> str:
     links = []
@@ -22,6 +29,27 @@ def _html_filename_for_route(route: str) -> str:
     return f"{slug}.html"
 
 
+def spec_fits_templates(spec: TaskSpec) -> Tuple[bool, str]:
+    """
+    Can write_code_from_spec build this spec faithfully?
+    Returns (fits, reason) where reason explains the first mismatch.
+    """
+    for api in spec.api:
+        if (api.method, api.path) not in TEMPLATE_APIS:
+            return False, f"API {api.method} {api.path} is not covered by templates"
+
+    routes = [page.route for page in spec.pages]
+    if len(set(routes)) != len(routes):
+        return False, "Duplicate page routes"
+    for route in routes:
+        if not _TEMPLATE_ROUTE.match(route):
+            return False, f"Page route {route!r} is not supported by templates"
+        if route.startswith(("/api", "/static")):
+            return False, f"Page route {route!r} collides with API/static paths"
+
+    return True, "All pages and APIs are covered by templates"
+
+
 def write_code_from_spec(spec: TaskSpec, files: List[Dict[str, str]]) -> List[Dict[str, str]]:
     """
     Fills file contents based on spec.
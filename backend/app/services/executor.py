@@ -0,0 +1,137 @@
+from __future__ import annotations
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Coroutine, Dict
+
+from app.core.config import settings
+
+STAGE_LLM = "llm"
+STAGE_DEPS = "deps"
+STAGE_SANDBOX = "sandbox"
+
+
+class StagePool:
+    """
+    A bounded pool for one pipeline stage.
+    Coroutines hold a slot while they work in the stage; blocking calls
+    run on the pool's own threads, never on the AnyIO threadpool that
+    serves the sync API endpoints.
+    """
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = max(1, size)
+        self._sem = asyncio.Semaphore(self.size)
+        self._threads = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=f"run-{name}")
+        self.active = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on this pool's threads while holding a slot.
+        """
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._threads, functools.partial(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "active": self.active, "waiting": self.waiting}
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+
+class RunExecutor:
+    """
+    Admits runs up to RUN_MAX_ACTIVE and gives each stage its own pool,
+    so a run sitting in the sandbox does not hold an LLM slot.
+    """
+    def __init__(
+        self,
+        max_active_runs: int = settings.RUN_MAX_ACTIVE,
+        llm_size: int = settings.POOL_LLM_SIZE,
+        deps_size: int = settings.POOL_DEPS_SIZE,
+        sandbox_size: int = settings.POOL_SANDBOX_SIZE,
+    ):
+        self.max_active_runs = max(1, max_active_runs)
+        self._run_slots = asyncio.Semaphore(self.max_active_runs)
+        self.pools: Dict[str, StagePool] = {
+            STAGE_LLM: StagePool(STAGE_LLM, llm_size),
+            STAGE_DEPS: StagePool(STAGE_DEPS, deps_size),
+            STAGE_SANDBOX: StagePool(STAGE_SANDBOX, sandbox_size),
+        }
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self.queued = 0
+        self.active_runs = 0
+
+    def has_capacity(self) -> bool:
+        return self.active_runs + self.queued < self.max_active_runs
+
+    def pool(self, stage: str) -> StagePool:
+        return self.pools[stage]
+
+    def submit(self, run_id: int, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """
+        Schedule a run coroutine. Must be called from the event loop.
+        """
+        task = asyncio.get_running_loop().create_task(self._admit(coro), name=f"run-{run_id}")
+        self._tasks[run_id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(run_id, None))
+        return task
+
+    def cancel(self, run_id: int) -> bool:
+        """
+        Cancel the run's task if it is in flight here (queued for a slot or running).
+        """
+        task = self._tasks.get(run_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def _admit(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        self.queued += 1
+        try:
+            await self._run_slots.acquire()
+        except BaseException:
+            coro.close()
+            raise
+        finally:
+            self.queued -= 1
+        self.active_runs += 1
+        try:
+            return await coro
+        finally:
+            self.active_runs -= 1
+            self._run_slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "active_runs": self.active_runs,
+            "max_active_runs": self.max_active_runs,
+            "pools": {name: p.stats() for name, p in self.pools.items()},
+        }
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for p in self.pools.values():
+            p.shutdown()
@@ -1,10 +1,64 @@
 from __future__ import annotations
+import asyncio
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
+
+
+class LLMStallError(TimeoutError):
+    """
+    The model stopped producing tokens within the stall window.
+    """
+
 
 class LLMClient(ABC):
     """
     Common interface for any LLM provider (local or API).
     """
     @abstractmethod
-    async def chat(self, model: str, system: str, user: str) -> str:
+    async def chat(self, model: str, system: str, user: str, temperature: float | None = None) -> str:
+        """
+        temperature=None keeps the provider's default.
+        """
         raise NotImplementedError
+
+    async def stream_chat(self, model: str, system: str, user: str) -> AsyncIterator[str]:
+        """
+        Yield the reply in chunks as they are generated.
+        Providers without streaming yield the whole reply once.
+        """
+        yield await self.chat(model=model, system=system, user=user)
+
+    async def aclose(self) -> None:
+        """
+        Release pooled connections. Called once on application shutdown.
+        """
+        return None
+
+
+async def guarded_stream(
+    llm: LLMClient,
+    model: str,
+    system: str,
+    user: str,
+    first_token_seconds: float,
+    stall_seconds: float,
+) -> AsyncIterator[str]:
+    """
+    Wrap llm.stream_chat() with a stall watchdog. Closing this generator (or a
+    stall) closes the underlying HTTP stream, which makes the server stop generating.
+    Use with contextlib.aclosing() so an early break cancels the request promptly.
+    """
+    stream = llm.stream_chat(model=model, system=system, user=user)
+    timeout = first_token_seconds
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise LLMStallError(f"No tokens from {model} for {timeout:g}s") from None
+            timeout = stall_seconds
+            yield chunk
+    finally:
+        await stream.aclose()
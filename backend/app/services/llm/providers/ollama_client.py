@@ -1,11 +1,23 @@
 import httpx
 import sys
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 
 class OllamaLLM:
     def __init__(self, base_url: str):
         self.base_url = base_url.rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # One pooled client for the lifetime of the process (keep-alive to Ollama)
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=1200)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def chat(
         self,
@@ -14,12 +26,33 @@ class OllamaLLM:
         system: Optional[str] = None,
         user: Optional[str] = None,
         timeout: int = 1200,
+        temperature: Optional[float] = None,
     ) -> str:
         """
         Supports two calling styles:
           A) chat(model=..., messages=[...], system="...")
           B) chat(model=..., system="...", user="...")
         """
+        full_content = []
+        async for content in self.stream_chat(
+            model, messages=messages, system=system, user=user, timeout=timeout, temperature=temperature
+        ):
+            full_content.append(content)
+        return "".join(full_content)
+
+    async def stream_chat(
+        self,
+        model: str,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        user: Optional[str] = None,
+        timeout: int = 1200,
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields content chunks as Ollama streams them. Same calling styles as chat().
+        May yield "" for chunks without content, so callers can tell the model is alive.
+        """
         # Build messages if caller used user/system style
         if messages is None:
             messages = []
@@ -32,34 +65,34 @@ class OllamaLLM:
             if system:
                 messages = [{"role": "system", "content": system}] + list(messages)
 
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # 1) Try Ollama native endpoint
-            native_url = f"{self.base_url}/api/chat"
-            # Enable streaming
-            native_payload = {"model": model, "messages": messages, "stream": True}
-            print(f"DEBUG: Ollama Request URL: {native_url}")
-            
-            full_content = []
-            
-            try:
-                async with client.stream("POST", native_url, json=native_payload) as response:
-                    response.raise_for_status()
-                    async for line in response.aiter_lines():
-                        if not line:
-                            continue
-                        try:
-                            chunk = json.loads(line)
-                            content = chunk.get("message", {}).get("content", "")
-                            if content:
-                                sys.stdout.write(content)
-                                sys.stdout.flush()
-                                full_content.append(content)
-                        except ValueError:
-                            pass
-            except Exception as e:
-                print(f"Stream error: {e}")
-                raise e
-            
-            print("\n") # Newline at end
-            return "".join(full_content)
- 
\ No newline at end of file
+        client = self._get_client()
+
+        # 1) Try Ollama native endpoint
+        native_url = f"{self.base_url}/api/chat"
+        # Enable streaming
+        native_payload = {"model": model, "messages": messages, "stream": True}
+        if temperature is not None:
+            native_payload["options"] = {"temperature": temperature}
+        print(f"DEBUG: Ollama Request URL: {native_url}")
+
+        try:
+            async with client.stream("POST", native_url, json=native_payload, timeout=timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        chunk = json.loads(line)
+                    except ValueError:
+                        continue
+                    content = chunk.get("message", {}).get("content", "")
+                    if content:
+                        sys.stdout.write(content)
+                        sys.stdout.flush()
+                    # Empty chunks (e.g. "thinking" tokens) are still yielded as keep-alives
+                    yield content
+        except Exception as e:
+            print(f"Stream error: {e}")
+            raise e
+
+        print("\n") # Newline at end
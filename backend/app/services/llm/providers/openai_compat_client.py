@@ -1,4 +1,6 @@
 from __future__ import annotations
+import json
+from typing import AsyncIterator
 import httpx
 from app.services.llm.base import LLMClient
 
@@ -10,8 +12,20 @@ class OpenAICompatLLM(LLMClient):
     def __init__(self, base_url: str, api_key: str):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
+        self._client: httpx.AsyncClient | None = None
 
-    async def chat(self, model: str, system: str, user: str) -> str:
+    def _get_client(self) -> httpx.AsyncClient:
+        # One pooled client for the lifetime of the process
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=180)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _request(self, model: str, system: str, user: str, temperature: float | None = None) -> tuple[str, dict, dict]:
         if not self.base_url or not self.api_key:
             raise RuntimeError("API_BASE_URL or API_KEY missing for LLM_MODE=api")
 
@@ -24,11 +38,32 @@ class OpenAICompatLLM(LLMClient):
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-            "temperature": 0.2,
+            "temperature": 0.2 if temperature is None else temperature,
         }
+        return url, headers, payload
+
+    async def chat(self, model: str, system: str, user: str, temperature: float | None = None) -> str:
+        url, headers, payload = self._request(model, system, user, temperature)
+        r = await self._get_client().post(url, headers=headers, json=payload)
+        r.raise_for_status()
+        data = r.json()
+        return data["choices"][0]["message"]["content"]
 
-        async with httpx.AsyncClient(timeout=180) as client:
-            r = await client.post(url, headers=headers, json=payload)
+    async def stream_chat(self, model: str, system: str, user: str) -> AsyncIterator[str]:
+        """
+        Server-sent events: "data: {...}" lines, terminated by "data: [DONE]".
+        """
+        url, headers, payload = self._request(model, system, user)
+        payload["stream"] = True
+        async with self._get_client().stream("POST", url, headers=headers, json=payload) as r:
             r.raise_for_status()
-            data = r.json()
-            return data["choices"][0]["message"]["content"]
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
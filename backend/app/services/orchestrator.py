@@ -1,131 +1,702 @@
 from __future__ import annotations
 import asyncio
+import shutil
+import time
+from dataclasses import dataclass
 from pathlib import Path
 from sqlmodel import Session
 
 from app.core.config import settings
-from app.services.workspace import project_workspace, write_files
+from app.services.workspace import project_workspace, write_files, clone_workspace
 from app.services.logging_service import log
-from app.services.sandbox.venv_runner import VenvSandboxRunner
-from app.db.repo import update_run_status
+from app.services.sandbox.venv_runner import VenvSandboxRunner, normalize_requirement_name
+from app.services.sandbox.supervisor import PreviewSupervisor
+from app.services.sandbox.venv_pool import VenvPool
+from app.services.sandbox.ports import PortAllocator
+from app.services.preview_manager import PreviewManager
+from app.services.preview_host import PreviewHost
+from app.services.validation import build_checks, validate_in_process, validate_over_http
+from app.services.preflight import preflight, format_findings
+from app.services.reflint import format_hints, lint_references
+from app.services.repair_cache import RepairCache, fingerprint, restore, snapshot
+from app.services.autofix import autofix
+from app.services.repair_context import select_context
+from app.services.sandbox.base import ExecResult
+from app.db.repo import update_run_status, save_checkpoint, get_checkpoint
+from app.services.executor import RunExecutor, STAGE_LLM, STAGE_DEPS, STAGE_SANDBOX
+from app.services.prompt_to_spec import TaskSpec
 
 from app.services.llm.factory import get_llm_client
-from app.services.router import ModelRouter
+from app.services.router import ModelRouter, ModelChoice
 from app.services.spec_generator import llm_prompt_to_spec
-from app.services.code_generator import llm_spec_to_code
+from app.services.code_generator import llm_spec_to_code, GenOutput, GenFile
 from app.services.repair import llm_repair
-from app.services.patcher import apply_unified_patch
+from app.services.patcher import PatchError, apply_unified_patch
+from app.services.scaffold import scaffold_from_spec
+from app.services.code_writer import write_code_from_spec, spec_fits_templates
 
 
-def _context_snippets(workspace: Path) -> str:
+REQUIREMENTS_PATH = "generated_app/backend/requirements.txt"
+# Per-run scratch dir for parallel repair candidates' workspace clones
+CANDIDATES_DIR = ".repair_candidates"
+# Rule-based fixes and cached replays don't use up MAX_REPAIR_ATTEMPTS; this bounds them instead
+MAX_FREE_FIXES = 4
+
+
+def _read_text(path: Path) -> str:
+    return path.read_text(encoding="utf-8") if path.exists() else ""
+
+
+@dataclass
+class RepairCandidate:
+    index: int
+    choice: ModelChoice
+    patch: str = ""
+    applied: bool = False
+    ok: bool = False
+    needs_install: bool = False
+    passed: int = 0
+    reason: str = ""
+    seconds: float = 0.0
+
+    def finish(self, started: float) -> "RepairCandidate":
+        self.seconds = time.monotonic() - started
+        return self
+
+
+class StageTimeout(Exception):
+    """
+    A pipeline stage ran past its deadline or the run's overall budget.
+    """
+
+
+class RunClock:
     """
-    Send only important files to repair model (avoid huge context).
+    Per-stage deadlines (settings.STAGE_DEADLINES) capped by the run's overall budget.
     """
-    candidates = [
-        "generated_app/backend/main.py",
-        "generated_app/backend/requirements.txt",
-        "generated_app/frontend/app.js",
-        "generated_app/frontend/index.html",
-        "generated_app/frontend/menu.html",
-        "generated_app/frontend/order.html",
-        "generated_app/frontend/styles.css",
-    ]
-    parts = []
-    for rel in candidates:
-        p = workspace / rel
-        if p.exists():
-            text = p.read_text(encoding="utf-8")
-            # limit size per file
-            text = text[:4000]
-            parts.append(f"\n--- FILE: {rel} ---\n{text}\n")
-    return "\n".join(parts)
+    def __init__(self, budget_seconds: float = settings.RUN_BUDGET_SECONDS):
+        self.expires = time.monotonic() + budget_seconds
+
+    async def within(self, stage: str, aw):
+        deadline = settings.STAGE_DEADLINES[stage]
+        remaining = self.expires - time.monotonic()
+        if remaining <= 0:
+            raise StageTimeout(f"Run budget exhausted before stage {stage}")
+        try:
+            return await asyncio.wait_for(aw, timeout=min(deadline, remaining))
+        except asyncio.TimeoutError:
+            limit = "run budget" if remaining < deadline else f"{deadline:g}s deadline"
+            raise StageTimeout(f"Stage {stage} exceeded the {limit}") from None
+
+
+# Pipeline stages in order; a run can restart from any of them
+STAGES = ["spec", "codegen", "deps", "run"]
+
+# Checkpoint a stage needs before the pipeline can start there
+REQUIRED_CHECKPOINT = {"codegen": "spec", "deps": "codegen", "run": "codegen"}
 
 
 class Orchestrator:
-    def __init__(self):
+    def __init__(self, executor: RunExecutor | None = None):
+        self.executor = executor or RunExecutor()
         self.runner = VenvSandboxRunner()
+        self.venv_pool = VenvPool(
+            self.runner,
+            settings.WORKSPACE_ROOT / ".venv_pool",
+            settings.SANDBOX_BASE_PACKAGES,
+            size=settings.VENV_POOL_SIZE,
+            low_water=settings.VENV_POOL_LOW_WATER,
+            refill_concurrency=settings.VENV_POOL_REFILL_CONCURRENCY,
+        )
+        self.runner.pool = self.venv_pool
+        self.supervisor = PreviewSupervisor(
+            self.runner,
+            PortAllocator(
+                settings.PREVIEW_PORT_START,
+                settings.PREVIEW_PORT_END,
+                reserved=[settings.BACKEND_PORT],
+            ),
+        )
+        self.previews = PreviewManager(
+            self.supervisor,
+            host=PreviewHost(settings.PREVIEW_READY_SECONDS) if settings.PREVIEW_HOST_MODE == "shared" else None,
+        )
+        self.repair_cache = RepairCache()
         self.router = ModelRouter()
         self.llm = get_llm_client()
 
-    def execute_run(self, session: Session, run, prompt: str, host: str = "0.0.0.0"):
+    def _resolve_start_stage(self, session: Session, run, from_stage: str | None) -> str:
+        """
+        Explicit from_stage is honoured if its checkpoint exists.
+        Otherwise resume right after the last good checkpoint (fresh runs start at spec).
+        """
+        if from_stage is not None:
+            needed = REQUIRED_CHECKPOINT.get(from_stage)
+            if needed is None or get_checkpoint(session, run.id, needed) is not None:
+                return from_stage
+            log(session, run.id, "resume", f"No {needed} checkpoint, cannot start at {from_stage}", level="ERROR")
+
+        if get_checkpoint(session, run.id, "codegen") is not None:
+            return "deps"
+        if get_checkpoint(session, run.id, "spec") is not None:
+            return "codegen"
+        return "spec"
+
+    async def _spec_stage(self, session: Session, run, prompt: str, redo: bool) -> TaskSpec:
+        if not redo:
+            spec = TaskSpec.model_validate_json(get_checkpoint(session, run.id, "spec").payload)
+            log(session, run.id, "spec", f"Reusing TaskSpec checkpoint: {spec.app_name}")
+            return spec
+
+        log(session, run.id, "spec", "Starting spec generation...")
+        spec_model = self.router.spec_model().model
+        async with self.executor.pool(STAGE_LLM).slot():
+            spec = await llm_prompt_to_spec(self.llm, spec_model, prompt)
+        save_checkpoint(session, run.id, "spec", spec.model_dump_json())
+        log(session, run.id, "spec", f"LLM TaskSpec: {spec.app_name}")
+        return spec
+
+    async def _codegen_stage(
+        self,
+        session: Session,
+        run,
+        ws: Path,
+        spec: TaskSpec,
+        redo: bool,
+        prepared: asyncio.Task | None = None,
+    ) -> tuple[GenOutput, asyncio.Task | None]:
+        """
+        Returns the generated output plus the early dependency install task,
+        started as soon as requirements.txt arrived (None if it never did).
+
+        When skipped, an existing generated_app is kept as is: it holds the code as
+        the previous attempt left it, with every repair applied. The checkpoint (raw
+        model output) is only written back if the workspace is gone.
+        """
+        if not redo:
+            gen = GenOutput.model_validate_json(get_checkpoint(session, run.id, "codegen").payload)
+            if (ws / "generated_app").is_dir():
+                log(session, run.id, "codegen", "Keeping the workspace's generated app, repairs included")
+            else:
+                write_files(ws, [{"path": f.path, "content": f.content} for f in gen.files])
+                log(session, run.id, "codegen", f"Restored {len(gen.files)} files from codegen checkpoint")
+            return gen, None
+
+        mode = settings.GENERATION_MODE
+        if mode in ("template", "auto"):
+            fits, reason = spec_fits_templates(spec)
+            if mode == "template" or fits:
+                log(session, run.id, "codegen", f"Using template writer ({mode} mode): {reason}")
+                return self._template_codegen(session, run, ws, spec), None
+            log(session, run.id, "codegen", f"Templates do not fit, using LLM: {reason}")
+
+        # Regenerating (e.g. a retry from codegen): files from the previous generation
+        # must not survive next to the new ones, as the template path also ensures
+        shutil.rmtree(ws / "generated_app", ignore_errors=True)
+        early_deps: list[asyncio.Task] = []
+
+        async def on_file(f: GenFile) -> None:
+            # Files are written as soon as the model closes them; cheap checks start right away
+            write_files(ws, [{"path": f.path, "content": f.content}])
+            log(session, run.id, "codegen", f"Wrote {f.path}")
+            if f.path.endswith(".py"):
+                try:
+                    compile(f.content, f.path, "exec")
+                except (SyntaxError, ValueError) as e:
+                    log(session, run.id, "codegen", f"Syntax error in {f.path}: {e}", level="ERROR")
+            elif f.path == REQUIREMENTS_PATH and not early_deps:
+                early_deps.append(asyncio.create_task(self._install_early(session, run, ws, ws / f.path, prepared)))
+
+        async def on_retry() -> None:
+            # Partial files from the rejected reply would be linted and run otherwise
+            shutil.rmtree(ws / "generated_app", ignore_errors=True)
+            log(session, run.id, "codegen", "Code output rejected, discarded its files and retrying")
+
+        log(session, run.id, "codegen", "Starting code generation...")
+        code_model = self.router.code_model().model
+        try:
+            async with self.executor.pool(STAGE_LLM).slot():
+                gen = await llm_spec_to_code(self.llm, code_model, spec, on_file=on_file, on_retry=on_retry)
+        except BaseException:
+            for t in early_deps:
+                t.cancel()
+            raise
+
+        save_checkpoint(session, run.id, "codegen", gen.model_dump_json())
+        log(session, run.id, "codegen", f"LLM generated {len(gen.files)} files")
+        return gen, (early_deps[0] if early_deps else None)
+
+    async def _install_early(self, session: Session, run, ws: Path, req_path: Path, prepared: asyncio.Task | None) -> str | None:
+        """
+        Install requirements while the rest of the code is still streaming.
+        Returns the requirements text that was installed, or None on failure.
+        """
+        snapshot = _read_text(req_path)
+        res = await self._deps_stage(session, run, ws, req_path, True, prepared)
+        return snapshot if res.exit_code == 0 else None
+
+    def _template_codegen(self, session: Session, run, ws: Path, spec: TaskSpec) -> GenOutput:
+        """
+        Deterministic codegen from the spec (scaffold + code_writer templates), in milliseconds.
+        """
+        # Drop anything a partial LLM stream already wrote
+        shutil.rmtree(ws / "generated_app", ignore_errors=True)
+        files = write_code_from_spec(spec, scaffold_from_spec(spec))
+        write_files(ws, files)
+        gen = GenOutput(files=[GenFile(**f) for f in files])
+        save_checkpoint(session, run.id, "codegen", gen.model_dump_json())
+        log(session, run.id, "codegen", f"Template writer generated {len(files)} files")
+        return gen
+
+    async def _prepare_sandbox(self, session: Session, run, ws: Path) -> frozenset[str]:
+        """
+        Speculative sandbox prep, started alongside the LLM stages: the venv and the
+        base stack do not depend on the generated code. Returns the normalized names
+        of the base packages now present in the venv.
+        """
+        deps_pool = self.executor.pool(STAGE_DEPS)
+        await deps_pool.run(self.runner.setup, ws)
+        base = settings.SANDBOX_BASE_PACKAGES
+        wanted = frozenset(normalize_requirement_name(p) for p in base)
+        if wanted <= self.runner.preinstalled(ws):
+            log(session, run.id, "sandbox", f"Claimed pre-warmed venv, base packages ready: {', '.join(base)}")
+            return wanted
+        log(session, run.id, "sandbox", "Venv sandbox created")
+
+        res = await deps_pool.run(self.runner.install_packages, ws, base)
+        if res.exit_code != 0:
+            log(session, run.id, "sandbox", res.stderr or "Base package install failed", level="ERROR")
+            return frozenset()
+        log(session, run.id, "sandbox", f"Base packages ready: {', '.join(base)}")
+        return wanted
+
+    async def _deps_stage(
+        self,
+        session: Session,
+        run,
+        ws: Path,
+        req_path: Path,
+        reinstall: bool,
+        prepared: asyncio.Task | None = None,
+    ) -> ExecResult:
+        deps_pool = self.executor.pool(STAGE_DEPS)
+        if not reinstall and self.runner.is_ready(ws):
+            log(session, run.id, "deps", "Reusing existing sandbox environment")
+            return ExecResult(exit_code=0, stdout="", stderr="")
+
+        preinstalled: frozenset[str] = frozenset()
+        if prepared is not None:
+            try:
+                preinstalled = await prepared
+            except Exception as e:
+                log(session, run.id, "sandbox", f"Speculative setup failed: {type(e).__name__}: {e}", level="ERROR")
+
+        if not self.runner.is_ready(ws):
+            log(session, run.id, "sandbox", "Setting up virtual environment...")
+            await deps_pool.run(self.runner.setup, ws)
+            log(session, run.id, "sandbox", "Venv sandbox created")
+
+        log(session, run.id, "deps", "Installing dependencies...")
+        install_res = await deps_pool.run(self.runner.install_deps, ws, req_path, preinstalled)
+        if install_res.stdout:
+            log(session, run.id, "deps", install_res.stdout.strip())
+        if install_res.exit_code != 0:
+            log(session, run.id, "deps", install_res.stderr or "Dependency install failed", level="ERROR")
+        return install_res
+
+    async def execute_run(
+        self,
+        session: Session,
+        run,
+        prompt: str,
+        host: str = "127.0.0.1",
+        from_stage: str | None = None,
+    ):
         """
-        Sync entrypoint (FastAPI route uses sync).
-        Internally we call async LLM via asyncio.run().
+        Async entrypoint, scheduled on the application's event loop by the RunExecutor.
+        LLM calls are awaited directly (the run yields while the model is generating);
+        blocking sandbox subprocess calls run on the deps/sandbox stage pools.
+        Spec and codegen outputs are checkpointed so retries can skip them.
         """
+        llm_pool = self.executor.pool(STAGE_LLM)
+        sandbox_pool = self.executor.pool(STAGE_SANDBOX)
+        prepared: asyncio.Task | None = None
+        early_deps: asyncio.Task | None = None
+
+        clock = RunClock()
         update_run_status(session, run, "running", attempts=run.attempts + 1)
         ws: Path = project_workspace(run.project_id, run.id)
         log(session, run.id, "workspace", f"Workspace: {ws}")
 
-        # Use unique port per run to avoid conflicts
-        port = 8000 + run.id
-        log(session, run.id, "run", f"Will start generated app on http://{host}:{port}")
-
         try:
-            # 1) PROMPT -> SPEC (LLM)
-            log(session, run.id, "spec", "Starting spec generation...")
-            spec_model = self.router.spec_model().model
-            spec = asyncio.run(llm_prompt_to_spec(self.llm, spec_model, prompt))
-            log(session, run.id, "spec", f"LLM TaskSpec: {spec.app_name}")
+            start = STAGES.index(self._resolve_start_stage(session, run, from_stage))
+            if start > 0:
+                log(session, run.id, "resume", f"Resuming from stage: {STAGES[start]}")
 
-            # 2) SPEC -> CODE FILES (LLM)
-            log(session, run.id, "codegen", "Starting code generation...")
-            code_model = self.router.code_model().model
-            gen = asyncio.run(llm_spec_to_code(self.llm, code_model, spec))
-            files = [{"path": f.path, "content": f.content} for f in gen.files]
+            # 0) Prepare the sandbox in the background while the LLM stages run
+            if start <= STAGES.index("deps"):
+                prepared = asyncio.create_task(self._prepare_sandbox(session, run, ws))
+
+            # 1) PROMPT -> SPEC (LLM)
+            spec = await clock.within("spec", self._spec_stage(session, run, prompt, redo=start <= STAGES.index("spec")))
 
-            write_files(ws, files)
-            log(session, run.id, "codegen", f"LLM generated {len(files)} files")
+            # 2) SPEC -> CODE FILES (LLM, deterministic templates if it overruns)
+            try:
+                _, early_deps = await clock.within("codegen", self._codegen_stage(
+                    session, run, ws, spec, redo=start <= STAGES.index("codegen"), prepared=prepared
+                ))
+            except StageTimeout as e:
+                log(session, run.id, "codegen", f"{e}; falling back to template writer", level="ERROR")
+                # Cancelling the early install leaves its pip running against the files the
+                # templates are about to replace. It only starts pip once `prepared` is done,
+                # so an unfinished `prepared` (venv creation) is left alone.
+                if prepared is None or prepared.done():
+                    self.runner.kill(ws)
+                self._template_codegen(session, run, ws, spec)
 
             backend_dir = ws / "generated_app" / "backend"
-            req_path = backend_dir / "requirements.txt"
+            req_path = ws / REQUIREMENTS_PATH
 
-            # 3) VENV SETUP + INSTALL
-            log(session, run.id, "sandbox", "Setting up virtual environment...")
-            self.runner.setup(ws)
-            log(session, run.id, "sandbox", "Venv sandbox created")
+            # 3) VENV SETUP + INSTALL (skipped if the early install already covered the final requirements)
+            reinstall = start <= STAGES.index("deps")
+            installed_reqs: str | None = None
+
+            async def install() -> ExecResult:
+                installed = await early_deps if early_deps is not None else None
+                if installed == _read_text(req_path):
+                    return ExecResult(exit_code=0, stdout="", stderr="")
+                return await self._deps_stage(session, run, ws, req_path, reinstall, prepared)
 
-            log(session, run.id, "deps", "Installing dependencies...")
-            install_res = self.runner.install_deps(ws, req_path)
-            if install_res.stdout:
-                log(session, run.id, "deps", install_res.stdout.strip())
-            if install_res.exit_code != 0:
-                log(session, run.id, "deps", install_res.stderr or "Dependency install failed", level="ERROR")
-                update_run_status(session, run, "failed")
-                return
-
-            # 4) RUN + REPAIR LOOP
-            attempts = 0
+            # 4) PREFLIGHT + RUN + REPAIR LOOP
+            in_process = settings.VALIDATION_MODE == "asgi"
+            checks = build_checks(spec)
+            # The repair applied before the current attempt: fingerprint, files before it (and
+            # right after it, for a fresh LLM repair), and the cache entry it came from (None for
+            # a fresh repair); a replay also keeps the failure it was applied for, to undo it
+            last_repair: dict | None = None
+            rejected_patch: str | None = None
+            # Runs of the generated code and of each repair-model patch; only the latter
+            # count towards MAX_REPAIR_ATTEMPTS
+            runs = 0
+            attempts = 1
+            free_fixes = 0
             while True:
-                attempts += 1
-                log(session, run.id, "run", f"Starting uvicorn attempt {attempts}")
+                runs += 1
+
+                # Static checks first: problems that need no venv or server go
+                # straight to repair, before any install or app start. Reference-lint
+                # results are only hints for the repair prompt; they never stop a run.
+                findings = preflight(ws)
+                hints = lint_references(ws)
+                if hints:
+                    log(session, run.id, "preflight", format_hints(hints), level="WARNING")
+                if findings:
+                    stage = "preflight"
+                    log(session, run.id, stage, f"{len(findings)} problem(s) found, skipping install and run", level="ERROR")
+                    run_res = ExecResult(exit_code=1, stdout="", stderr=format_findings(findings))
+                else:
+                    stage = "run"
+                    run_res = None
+                    # (Re)install only when requirements.txt changed since the last install
+                    if installed_reqs != _read_text(req_path):
+                        try:
+                            deps_res = await clock.within("deps", install())
+                        except StageTimeout:
+                            self.runner.kill(ws)
+                            raise
+                        if deps_res.exit_code != 0:
+                            # Bad pins or unknown packages go to repair like any other failure
+                            stage = "deps"
+                            run_res = ExecResult(
+                                exit_code=deps_res.exit_code,
+                                stdout="",
+                                stderr=deps_res.stderr or "Dependency install failed",
+                            )
+                        else:
+                            installed_reqs = _read_text(req_path)
+                            reinstall = True
+
+                if run_res is None:
+                    if in_process:
+                        log(session, run.id, "run", f"ASGI probe attempt {runs}")
+                    else:
+                        log(session, run.id, "run", f"Starting uvicorn attempt {runs}")
 
-                run_res = self.runner.run_uvicorn(ws, backend_dir, host=host, port=port)
+                    # The supervisor returns as soon as the app answers on "/" (or dies);
+                    # the spec-derived route checks then run against it concurrently,
+                    # and a passing app stays up in the background.
+                    async def start_app():
+                        async with sandbox_pool.slot():
+                            res = await self.previews.start(
+                                run.id, ws, backend_dir, host=host,
+                                ready_timeout=settings.PREVIEW_READY_SECONDS,
+                            )
+                        entry = self.supervisor.get(run.id)
+                        if res.exit_code != 0 or entry is None:
+                            return res
+                        checked, _ = await validate_over_http(f"http://127.0.0.1:{entry.port}", checks)
+                        if checked.exit_code != 0:
+                            self.previews.stop(run.id)
+                        return checked
+
+                    # No server at all: import errors and 5xx come back as tracebacks
+                    async def probe_app():
+                        res, _ = await sandbox_pool.run(validate_in_process, self.runner, ws, backend_dir, checks)
+                        return res
+
+                    run_res = await clock.within("run", probe_app() if in_process else start_app())
+
+                if last_repair is not None:
+                    self._settle_repair(session, run, ws, last_repair, ok=run_res.exit_code == 0)
 
                 if run_res.exit_code == 0:
                     update_run_status(session, run, "success")
+                    log(session, run.id, "run", run_res.stdout)
                     log(session, run.id, "done", "Generated app ran successfully")
                     return
 
                 # Failed
                 err = (run_res.stderr or "").strip()
                 out = (run_res.stdout or "").strip()
-                log(session, run.id, "run", out if out else "No stdout")
-                log(session, run.id, "run", err if err else "No stderr", level="ERROR")
+                if stage != "deps":  # the deps stage already logged pip's output
+                    if out:
+                        log(session, run.id, stage, out)
+                    log(session, run.id, stage, err if err else "No stderr", level="ERROR")
+
+                if last_repair is not None and last_repair["entry"] is not None:
+                    # Undo the replay so the next repair sees this run's own code and failure
+                    restore(ws, last_repair["before"])
+                    stage, err, out = last_repair["stage"], last_repair["err"], last_repair["out"]
+                    log(session, run.id, "repair", "Reverted the cached repair")
 
                 if attempts >= settings.MAX_REPAIR_ATTEMPTS:
                     update_run_status(session, run, "failed")
                     log(session, run.id, "repair", "Max repair attempts reached", level="ERROR")
                     return
 
-                # 5) REPAIR (LLM) -> PATCH -> APPLY
-                repair_model = self.router.repair_model().model
-                context = _context_snippets(ws)
-                patch = asyncio.run(llm_repair(self.llm, repair_model, error_text=err or out, context=context))
+                # 5) REPAIR: rule-based fixes first, no model call needed
+                fixes = [f for f in autofix(ws, err or out) if f.applied] if free_fixes < MAX_FREE_FIXES else []
+                if fixes:
+                    free_fixes += 1
+                    for f in fixes:
+                        log(session, run.id, "repair", f"Auto-fix ({f.fixer}): {f.detail}")
+                    log(session, run.id, "repair", "Rule-based fix applied, retrying run...")
+                    last_repair = None
+                    continue
+
+                # Then replay a cached fix for this error signature
+                fp, signature = fingerprint(err or out)
+                before = snapshot(ws)
+                retried_same = last_repair is not None and last_repair["fp"] == fp and last_repair["entry"] is not None
+                entry = None if retried_same or free_fixes >= MAX_FREE_FIXES else self.repair_cache.lookup(session, fp)
+                if entry is not None:
+                    if self.repair_cache.replay(ws, entry):
+                        free_fixes += 1
+                        log(session, run.id, "repair", f"Applied cached repair {fp[:8]} (hit {entry.hits}), retrying run...")
+                        last_repair = {
+                            "fp": fp, "signature": signature, "before": before, "entry": entry,
+                            "stage": stage, "err": err, "out": out,
+                        }
+                        continue
+                    log(session, run.id, "repair", f"Cached repair {fp[:8]} does not fit this code, asking the repair model")
+
+                # LLM -> PATCH -> APPLY
+                attempts += 1
+                parallel = settings.REPAIR_CANDIDATES > 1
+                choices = self.router.repair_candidates(settings.REPAIR_CANDIDATES) if parallel else [self.router.repair_model()]
+                error_text = err or out
+                if hints:
+                    error_text += "\n\n" + format_hints(hints)
+                context = select_context(ws, error_text, min(c.context_tokens for c in choices))
+                log(session, run.id, "repair", f"Repair context {context.describe()}")
+                if rejected_patch:
+                    error_text += f"\n\nYour previous patch could not be applied: {rejected_patch}"
+
+                if parallel:
+                    # Candidates can only be run if the shared venv matches requirements.txt
+                    venv_current = installed_reqs is not None and installed_reqs == _read_text(req_path)
+                    winner = await clock.within("repair", self._race_repairs(
+                        session, run, ws, choices, error_text, context.text, checks, venv_current
+                    ))
+                    if winner is None:
+                        log(session, run.id, "repair", "No repair candidate applied", level="ERROR")
+                        rejected_patch = "none of the candidate patches applied to the current files"
+                        last_repair = None
+                        continue
+                    patch = winner.patch
+                else:
+                    async def repair() -> str:
+                        async with llm_pool.slot():
+                            return await llm_repair(self.llm, choices[0].model, error_text=error_text, context=context.text)
+
+                    patch = await clock.within("repair", repair())
 
                 log(session, run.id, "repair", "Applying patch from repair LLM")
-                apply_unified_patch(ws, patch)
-                log(session, run.id, "repair", "Patch applied, retrying run...")
+                try:
+                    applied = apply_unified_patch(ws, patch)
+                except PatchError as e:
+                    # Nothing was written; the next repair prompt says why the patch failed
+                    log(session, run.id, "repair", f"Patch rejected: {e}", level="ERROR")
+                    rejected_patch = str(e)
+                    last_repair = None
+                    continue
+                rejected_patch = None
+                log(session, run.id, "repair", f"Patch applied ({applied.summary()}), retrying run...")
+                # Taken now, before install and run: data files the app writes at runtime
+                # must not end up in the cached edits
+                last_repair = {"fp": fp, "signature": signature, "before": before, "after": snapshot(ws), "entry": None}
 
+        except asyncio.CancelledError:
+            # Cancelled via the API, a lost lease or shutdown: LLM streams close as the
+            # cancellation unwinds; sandbox subprocesses have to be killed explicitly.
+            self.runner.kill(ws)
+            self.previews.stop(run.id)
+            raise
         except Exception as e:
             log(session, run.id, "fatal", f"{type(e).__name__}: {e}", level="ERROR")
             update_run_status(session, run, "failed")
+        finally:
+            for task in (prepared, early_deps):
+                if task is not None and not task.done():
+                    task.cancel()
+                elif task is not None and not task.cancelled():
+                    task.exception()  # already logged by the stage if it mattered
+
+    async def _repair_candidate(
+        self,
+        ws: Path,
+        clone: Path,
+        choice: ModelChoice,
+        index: int,
+        error_text: str,
+        context: str,
+        checks: list[dict],
+        validate: bool,
+    ) -> RepairCandidate:
+        """
+        Ask one model/temperature for a patch, apply it to a clone of the workspace
+        and check the result: static checks always, route checks when `validate`.
+        """
+        started = time.monotonic()
+        cand = RepairCandidate(index=index, choice=choice)
+        async with self.executor.pool(STAGE_LLM).slot():
+            cand.patch = await llm_repair(
+                self.llm, choice.model, error_text=error_text, context=context, temperature=choice.temperature
+            )
+        sandbox_pool = self.executor.pool(STAGE_SANDBOX)
+        try:
+            # Walking and linking the tree is blocking file I/O; keep it off the event loop
+            await sandbox_pool.run(clone_workspace, ws, clone, self.runner.venv_dir_name)
+            apply_unified_patch(clone, cand.patch)
+        except PatchError as e:
+            cand.reason = f"patch rejected: {e}"
+            return cand.finish(started)
+        cand.applied = True
+
+        findings = preflight(clone)
+        if findings:
+            cand.reason = f"pre-flight: {findings[0]}" + (f" (+{len(findings) - 1} more)" if len(findings) > 1 else "")
+        elif _read_text(clone / REQUIREMENTS_PATH) != _read_text(ws / REQUIREMENTS_PATH):
+            cand.needs_install = True
+            cand.reason = "changes requirements.txt, needs an install to check"
+        elif not validate:
+            cand.ok = True
+            cand.reason = "passes static checks"
+        else:
+            res, report = await sandbox_pool.run(
+                validate_in_process, self.runner, clone, clone / "generated_app" / "backend", checks
+            )
+            cand.ok = res.exit_code == 0
+            cand.passed = sum(1 for c in (report or {}).get("checks", []) if c.get("ok"))
+            cand.reason = res.stdout.strip() or "route checks failed"
+        return cand.finish(started)
+
+    async def _race_repairs(
+        self,
+        session: Session,
+        run,
+        ws: Path,
+        choices: list[ModelChoice],
+        error_text: str,
+        context: str,
+        checks: list[dict],
+        validate: bool,
+    ) -> RepairCandidate | None:
+        """
+        Request len(choices) patches at once, each checked in its own workspace clone.
+        The first passing candidate wins and the rest are cancelled. If none passes,
+        prefer one that only needs a dependency install, then the one passing most
+        checks. None if no patch applied at all.
+        """
+        root = ws / CANDIDATES_DIR
+        shutil.rmtree(root, ignore_errors=True)
+        log(session, run.id, "repair", "Requesting {} repair candidates: {}".format(
+            len(choices), ", ".join(f"{c.model or 'default'}@{c.temperature if c.temperature is not None else 'default'}" for c in choices)
+        ))
+        tasks = [
+            asyncio.create_task(self._repair_candidate(
+                ws, root / f"c{i}", choice, i + 1, error_text, context, checks, validate
+            ))
+            for i, choice in enumerate(choices)
+        ]
+        finished: list[RepairCandidate] = []
+        winner: RepairCandidate | None = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    cand = await next_done
+                except Exception as e:
+                    log(session, run.id, "repair", f"Repair candidate failed: {type(e).__name__}: {e}", level="ERROR")
+                    continue
+                finished.append(cand)
+                log(session, run.id, "repair", f"Candidate {cand.index} ({cand.choice.model or 'default'}): "
+                    f"{'passed' if cand.ok else 'failed'} in {cand.seconds:.1f}s, {cand.reason}")
+                if cand.ok:
+                    winner = cand
+                    break
+        finally:
+            pending = [t for t in tasks if not t.done()]
+            for t in pending:
+                t.cancel()
+            self.runner.kill(root)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            shutil.rmtree(root, ignore_errors=True)
+            if winner is not None and pending:
+                log(session, run.id, "repair", f"Cancelled {len(pending)} slower candidate(s)")
+
+        if winner is None:
+            fallback = [c for c in finished if c.needs_install] or sorted(
+                (c for c in finished if c.applied), key=lambda c: c.passed, reverse=True
+            )
+            winner = fallback[0] if fallback else None
+            if winner is not None:
+                log(session, run.id, "repair", f"No candidate passed; using candidate {winner.index} ({winner.reason})")
+        return winner
+
+    def _settle_repair(self, session: Session, run, ws: Path, repair: dict, ok: bool) -> None:
+        """
+        Credit or blame a cached repair; remember a fresh one that fixed its error.
+        """
+        entry = repair["entry"]
+        if entry is not None:
+            self.repair_cache.record_outcome(session, entry, ok)
+            if not ok:
+                log(session, run.id, "repair", f"Cached repair {repair['fp'][:8]} did not fix the error")
+        elif ok and self.repair_cache.store(session, repair["fp"], repair["signature"], repair["before"], repair["after"]):
+            log(session, run.id, "repair", f"Cached repair {repair['fp'][:8]} for: {repair['signature'].splitlines()[0]}")
+
+    def cancel(self, run) -> bool:
+        """
+        Stop a run in this process: cancel its task (closing in-flight LLM streams)
+        and kill its sandbox process trees. Returns True if anything was stopped.
+        """
+        task_cancelled = self.executor.cancel(run.id)
+        killed = self.runner.kill(project_workspace(run.project_id, run.id))
+        stopped = self.previews.stop(run.id)
+        return task_cancelled or killed > 0 or stopped
+
+    async def aclose(self) -> None:
+        # Ready previews are left running; the next process adopts them on startup.
+        await self.previews.stop_reaper()
+        self.venv_pool.stop()
+        await self.llm.aclose()
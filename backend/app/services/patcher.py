@@ -1,68 +1,415 @@
 from __future__ import annotations
+import json
+import os
 import re
+import tempfile
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 
 PATCH_BEGIN = "*** Begin Patch"
 PATCH_END = "*** End Patch"
+REPLACE_MARKER = "+++ REPLACE ENTIRE FILE +++"
 
-def apply_unified_patch(workspace: Path, patch_text: str) -> None:
-    """
-    Supports patches in the format:
-    *** Begin Patch
-    *** Update File: path/to/file
-    @@ ...
-    -old
-    +new
-    *** End Patch
-    """
-    if PATCH_BEGIN not in patch_text or PATCH_END not in patch_text:
-        raise ValueError("Patch missing Begin/End markers")
-
-    # Split into file blocks
-    blocks = patch_text.split("*** Update File:")
-    if len(blocks) < 2:
-        raise ValueError("No file update blocks found in patch")
-
-    for b in blocks[1:]:
-        # first line until newline is the file path
-        lines = b.splitlines()
-        file_path = lines[0].strip()
-        file_abs = (workspace / file_path).resolve()
-
-        if not file_abs.exists():
-            raise FileNotFoundError(f"Patch refers to missing file: {file_path}")
-
-        original = file_abs.read_text(encoding="utf-8").splitlines(keepends=False)
-
-        # Very small patcher: only handles simple @@ hunks with + and - lines
-        # For MVP, we do a naive replace by reconstructing based on hunk lines.
-        # (Good enough for your FYP demo; later you can add a full patch lib.)
-        hunk_lines = [ln for ln in lines[1:] if ln and not ln.startswith("***")]
-
-        # If model returns full file replacement (common), detect marker:
-        if any(ln.startswith("+++ REPLACE ENTIRE FILE +++") for ln in hunk_lines):
-            # everything after that line is the new file
-            idx = next(i for i, ln in enumerate(hunk_lines) if ln.startswith("+++ REPLACE ENTIRE FILE +++"))
-            new_content = "\n".join(hunk_lines[idx+1:]) + "\n"
-            file_abs.write_text(new_content, encoding="utf-8")
+# Context lines a hunk may lose at each end before it is rejected (GNU patch's fuzz)
+MAX_FUZZ = 2
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@ ?(.*)$")
+_DIRECTIVE = re.compile(r"^\*\*\* (Update File|Add File|Delete File|Move to): (.+?)\s*$")
+
+
+class PatchError(ValueError):
+    """
+    The patch could not be parsed or applied; nothing was written.
+    """
+
+
+@dataclass
+class Hunk:
+    lines: List[Tuple[str, str]] = field(default_factory=list)  # (" " | "-" | "+", text)
+    start: Optional[int] = None     # 1-based old line from a "@@ -l,n +l,n @@" header
+    anchor: Optional[str] = None    # "@@ def handler():" -- a line to search from
+
+    @property
+    def old(self) -> List[str]:
+        return [t for op, t in self.lines if op != "+"]
+
+    @property
+    def new(self) -> List[str]:
+        return [t for op, t in self.lines if op != "-"]
+
+    def trimmed(self, fuzz: int) -> "Hunk":
+        """
+        Drop up to `fuzz` context lines from each end.
+        """
+        lines = list(self.lines)
+        for _ in range(fuzz):
+            if lines and lines[0][0] == " ":
+                lines.pop(0)
+        for _ in range(fuzz):
+            if lines and lines[-1][0] == " ":
+                lines.pop()
+        return Hunk(lines, self.start, self.anchor)
+
+
+@dataclass
+class FileOp:
+    kind: str                       # "update" | "add" | "delete" | "replace"
+    path: str
+    move_to: Optional[str] = None
+    hunks: List[Hunk] = field(default_factory=list)
+    content: List[str] = field(default_factory=list)  # "add" / "replace"
+
+
+@dataclass
+class PatchResult:
+    # (path, what happened) in patch order
+    changes: List[Tuple[str, str]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return "; ".join(f"{path}: {what}" for path, what in self.changes)
+
+
+def _hunk_line(op: FileOp, raw: str) -> None:
+    if raw.startswith("\\"):
+        return  # "\ No newline at end of file"
+    if raw.startswith("@@"):
+        m = _HUNK_HEADER.match(raw)
+        if m:
+            op.hunks.append(Hunk(start=int(m.group(1)), anchor=m.group(2).strip() or None))
+        else:
+            op.hunks.append(Hunk(anchor=raw[2:].strip().strip("@").strip() or None))
+        return
+    if not op.hunks:
+        op.hunks.append(Hunk())
+    if raw[:1] in (" ", "-", "+"):
+        op.hunks[-1].lines.append((raw[0], raw[1:]))
+    else:
+        # Models drop the leading space on blank (and sometimes other) context lines
+        op.hunks[-1].lines.append((" ", raw))
+
+
+def _parse_envelope(text: str) -> List[FileOp]:
+    body = text.split(PATCH_BEGIN, 1)[1]
+    body = body.split(PATCH_END, 1)[0]
+    ops: List[FileOp] = []
+    current: Optional[FileOp] = None
+    for raw in body.splitlines():
+        m = _DIRECTIVE.match(raw)
+        if m:
+            kind, path = m.groups()
+            if kind == "Move to":
+                if current is None or current.kind not in ("update", "replace"):
+                    raise PatchError(f"'*** Move to: {path}' without an Update File")
+                current.move_to = path
+                continue
+            current = FileOp({"Update File": "update", "Add File": "add", "Delete File": "delete"}[kind], path)
+            ops.append(current)
+            continue
+        if current is None or raw.startswith("*** End of File"):
             continue
+        if current.kind == "replace" or (current.kind == "update" and raw.startswith(REPLACE_MARKER)):
+            # Whole-file replacement (the format earlier repair prompts asked for)
+            if current.kind == "update":
+                current.kind = "replace"
+            else:
+                current.content.append(raw)
+        elif current.kind == "add":
+            current.content.append(raw[1:] if raw.startswith("+") else raw)
+        elif current.kind == "update":
+            _hunk_line(current, raw)
+        elif raw.strip():
+            raise PatchError(f"unexpected content after '*** Delete File: {current.path}'")
+    return ops
+
+
+def _strip_prefix(path: str) -> Optional[str]:
+    path = path.split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    return path[2:] if path[:2] in ("a/", "b/") else path
+
+
+def _parse_unified(text: str) -> List[FileOp]:
+    """
+    git / GNU unified diffs: ---/+++ headers (/dev/null for add and delete),
+    "rename from/to" lines and @@ hunks.
+    """
+    ops: List[FileOp] = []
+    current: Optional[FileOp] = None
+    rename_from: Optional[str] = None
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        raw = lines[i]
+        if raw.startswith("diff --git"):
+            current, rename_from = None, None
+        elif raw.startswith("rename from "):
+            rename_from = raw[len("rename from "):].strip()
+        elif raw.startswith("rename to ") and rename_from:
+            current = FileOp("update", rename_from, move_to=raw[len("rename to "):].strip())
+            ops.append(current)
+        elif raw.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            old, new = _strip_prefix(raw[4:]), _strip_prefix(lines[i + 1][4:])
+            i += 1
+            if old is None and new is None:
+                raise PatchError("diff header with /dev/null on both sides")
+            if current is not None and current.move_to and current.path == old:
+                pass  # hunks for the rename recorded above
+            elif old is None:
+                current = FileOp("add", new)
+                ops.append(current)
+            elif new is None:
+                current = FileOp("delete", old)
+                ops.append(current)
+            else:
+                current = FileOp("update", old, move_to=new if new != old else None)
+                ops.append(current)
+        elif current is not None and current.kind == "add":
+            if raw.startswith("+"):
+                current.content.append(raw[1:])
+        elif current is not None and current.kind == "update" and (raw.startswith(("@@", " ", "-", "+", "\\")) or raw == ""):
+            if raw.startswith("@@") or current.hunks:
+                _hunk_line(current, raw)
+        i += 1
+    return ops
 
-        # Otherwise: if patch contains no @@, treat plus-lines as new file (fallback)
-        if not any(ln.startswith("@@") for ln in hunk_lines):
-            # fallback: keep original, append comment with error (not ideal)
-            file_abs.write_text("\n".join(original) + "\n", encoding="utf-8")
+
+def parse_patch(patch_text: str) -> List[FileOp]:
+    """
+    Accepts the "*** Begin Patch" envelope (Update/Add/Delete File, Move to, @@ hunks,
+    or a whole-file REPLACE block) and plain unified diffs.
+    """
+    if PATCH_BEGIN in patch_text:
+        ops = _parse_envelope(patch_text)
+    elif re.search(r"^--- .*\n\+\+\+ ", patch_text, re.M):
+        ops = _parse_unified(patch_text)
+    else:
+        raise PatchError("Patch missing Begin/End markers")
+    if not ops:
+        raise PatchError("No file operations found in patch")
+    for op in ops:
+        for hunk in op.hunks:
+            # Blank lines trailing a hunk are usually the model's spacing, not context
+            while hunk.lines and hunk.lines[-1] == (" ", ""):
+                hunk.lines.pop()
+        if op.kind == "update" and not op.move_to and not any(h.lines for h in op.hunks):
+            raise PatchError(f"Update File {op.path} has no hunks")
+    return ops
+
+
+_NORMALIZERS: List[Callable[[str], str]] = [
+    lambda s: s,
+    str.rstrip,
+    lambda s: " ".join(s.split()),
+]
+
+
+def _find(lines: List[str], old: List[str], hint: int, lo: int) -> Optional[int]:
+    """
+    Position of `old` in `lines` closest to `hint`: exact first, then ignoring
+    trailing whitespace, then ignoring all whitespace differences.
+    Matches at or after `lo` (the end of the previous hunk) win.
+    """
+    n = len(old)
+    for norm in _NORMALIZERS:
+        target = [norm(x) for x in old]
+        hay = [norm(x) for x in lines]
+        found = [i for i in range(len(lines) - n + 1) if hay[i:i + n] == target]
+        if found:
+            after = [i for i in found if i >= lo]
+            return min(after or found, key=lambda i: abs(i - hint))
+    return None
+
+
+def _locate_anchor(lines: List[str], anchor: str, lo: int) -> Optional[int]:
+    key = " ".join(anchor.split())
+    for start in (lo, 0):
+        for i in range(start, len(lines)):
+            if key and key in " ".join(lines[i].split()):
+                return i
+    return None
+
+
+def _merge(matched: List[str], hunk: Hunk) -> List[str]:
+    """
+    The hunk's new lines, with context lines taken from the file as it is
+    (a loose match must not rewrite their whitespace).
+    """
+    out, k = [], 0
+    for op, text in hunk.lines:
+        if op == "+":
+            out.append(text)
             continue
+        if op == " ":
+            out.append(matched[k])
+        k += 1
+    return out
 
-        # Minimal hunk apply: rebuild from + lines, ignoring - lines, ignoring @@ headers
-        rebuilt = []
-        for ln in hunk_lines:
-            if ln.startswith("@@"):
-                continue
-            if ln.startswith("+"):
-                rebuilt.append(ln[1:])
-            elif ln.startswith("-"):
-                continue
+
+def _apply_hunks(path: str, lines: List[str], hunks: List[Hunk]) -> Tuple[List[str], int]:
+    """
+    Apply hunks in order, tolerating shifted line numbers and, failing an exact
+    match, up to MAX_FUZZ lost context lines at either end. Returns the new
+    lines and the largest fuzz needed.
+    """
+    lines = list(lines)
+    lo = 0
+    delta = 0
+    worst = 0
+    for n, hunk in enumerate(hunks, 1):
+        if not hunk.lines:
+            continue
+        hint = (hunk.start - 1 + delta) if hunk.start else lo
+        if hunk.anchor:
+            at = _locate_anchor(lines, hunk.anchor, lo)
+            if at is not None:
+                # The anchor line itself precedes the hunk
+                hint = lo = at + 1
+        if not hunk.old:
+            # "@@ -l,0 ..." inserts after old line l
+            if hunk.start and not hunk.anchor:
+                hint = hunk.start + delta
+            at = min(max(hint, 0), len(lines)) if (hunk.start or hunk.anchor) else len(lines)
+            lines[at:at] = hunk.new
+            lo = at + len(hunk.new)
+            delta += len(hunk.new)
+            continue
+
+        for fuzz in range(MAX_FUZZ + 1):
+            candidate = hunk.trimmed(fuzz) if fuzz else hunk
+            if not candidate.old:
+                break
+            at = _find(lines, candidate.old, hint, lo)
+            if at is not None:
+                lines[at:at + len(candidate.old)] = _merge(lines[at:at + len(candidate.old)], candidate)
+                lo = at + len(candidate.new)
+                delta += len(candidate.new) - len(candidate.old)
+                worst = max(worst, fuzz)
+                break
+        else:
+            at = None
+        if at is None:
+            preview = "\n".join(f"{op}{t}" for op, t in hunk.lines[:6])
+            raise PatchError(f"{path}: hunk {n} does not match the file:\n{preview}")
+    return lines, worst
+
+
+def _join(lines: List[str]) -> str:
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _check_syntax(path: str, content: str) -> None:
+    if path.endswith(".py"):
+        try:
+            compile(content, path, "exec")
+        except SyntaxError as e:
+            raise PatchError(f"{path}:{e.lineno}: patched file does not compile: {e.msg}") from None
+    elif path.endswith(".json") and content.strip():
+        try:
+            json.loads(content)
+        except ValueError as e:
+            raise PatchError(f"{path}: patched file is not valid JSON: {e}") from None
+
+
+def _target(workspace: Path, rel: str) -> Path:
+    root = workspace.resolve()
+    target = (root / rel).resolve()
+    if Path(rel).is_absolute() or root not in target.parents:
+        raise PatchError(f"Patch path escapes the workspace: {rel}")
+    return target
+
+
+def _write_atomic(path: Path, data: bytes, mode: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _commit(writes: Dict[Path, Optional[str]]) -> None:
+    """
+    Write every file via temp file + os.replace; on any OS error, put back
+    the files already touched.
+    """
+    backups = {p: (p.read_bytes(), p.stat().st_mode & 0o777) if p.exists() else None for p in writes}
+    done: List[Path] = []
+    try:
+        for p, content in writes.items():
+            if content is None:
+                p.unlink(missing_ok=True)
             else:
-                rebuilt.append(ln)
+                mode = backups[p][1] if backups[p] else 0o644
+                _write_atomic(p, content.encode("utf-8"), mode)
+            done.append(p)
+    except OSError as e:
+        for p in reversed(done):
+            if backups[p] is None:
+                p.unlink(missing_ok=True)
+            else:
+                _write_atomic(p, *backups[p])
+        raise PatchError(f"Writing the patch failed, changes rolled back: {e}") from e
+
+
+def apply_unified_patch(workspace: Path, patch_text: str) -> PatchResult:
+    """
+    Apply a repair patch to the workspace, all or nothing.
+
+    Every operation is applied in memory first: hunks are located with
+    line-offset and fuzz tolerance, Python/JSON results are syntax-checked,
+    and only then are the files written (each atomically, with rollback if a
+    write fails). Raises PatchError and leaves the workspace untouched if any
+    part of the patch does not apply.
+    """
+    ops = parse_patch(patch_text)
+    original: Dict[str, Optional[str]] = {}
+    state: Dict[str, Optional[str]] = {}
+    result = PatchResult()
+
+    def current(rel: str) -> Optional[str]:
+        if rel not in state:
+            p = _target(workspace, rel)
+            original[rel] = state[rel] = p.read_text(encoding="utf-8") if p.is_file() else None
+        return state[rel]
+
+    for op in ops:
+        text = current(op.path)
+        if op.kind == "add":
+            state[op.path] = _join(op.content)
+            result.changes.append((op.path, "replaced (add of existing file)" if text is not None else "added"))
+            continue
+        if text is None:
+            raise PatchError(f"Patch refers to missing file: {op.path}")
+        if op.kind == "delete":
+            state[op.path] = None
+            result.changes.append((op.path, "deleted"))
+            continue
+        if op.kind == "replace":
+            new_text, what = _join(op.content), "replaced whole file"
+        else:
+            new_lines, fuzz = _apply_hunks(op.path, text.splitlines(), op.hunks)
+            new_text = _join(new_lines)
+            count = sum(1 for h in op.hunks if h.lines)
+            what = f"{count} hunk{'s' if count != 1 else ''}" + (f", fuzz {fuzz}" if fuzz else "")
+        if op.move_to and op.move_to != op.path:
+            if current(op.move_to) is not None:
+                raise PatchError(f"Cannot move {op.path} to existing file {op.move_to}")
+            state[op.path] = None
+            state[op.move_to] = new_text
+            what += f", moved to {op.move_to}"
+        else:
+            state[op.path] = new_text
+        result.changes.append((op.path, what))
+
+    for rel, content in state.items():
+        if content is not None:
+            _check_syntax(rel, content)
 
-        file_abs.write_text("\n".join(rebuilt) + "\n", encoding="utf-8")
+    _commit({_target(workspace, rel): content for rel, content in state.items() if content != original[rel]})
+    return result
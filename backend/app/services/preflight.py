@@ -0,0 +1,243 @@
+from __future__ import annotations
+import ast
+import importlib
+import importlib.util
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.services.sandbox.venv_runner import normalize_requirement_name
+
+BACKEND_DIR = "generated_app/backend"
+FRONTEND_DIR = "generated_app/frontend"
+REQUIREMENTS = "generated_app/backend/requirements.txt"
+
+# Distribution -> import names, where they differ from the distribution name
+IMPORT_NAMES: Dict[str, List[str]] = {
+    "python-multipart": ["multipart", "python_multipart"],
+    "python-dotenv": ["dotenv"],
+    "python-jose": ["jose"],
+    "pyjwt": ["jwt"],
+    "pyyaml": ["yaml"],
+    "pillow": ["PIL"],
+    "beautifulsoup4": ["bs4"],
+    "scikit-learn": ["sklearn"],
+    "psycopg2-binary": ["psycopg2"],
+    "email-validator": ["email_validator"],
+}
+
+# Packages a distribution pulls in, so importing them without listing them is fine
+TRANSITIVE: Dict[str, List[str]] = {
+    "fastapi": ["starlette", "pydantic", "pydantic_core", "typing_extensions", "anyio", "sniffio", "idna"],
+    "starlette": ["anyio", "sniffio", "idna"],
+    "pydantic": ["pydantic_core", "typing_extensions", "annotated_types"],
+    "uvicorn": ["click", "h11"],
+    "sqlmodel": ["sqlalchemy", "pydantic", "pydantic_core", "typing_extensions"],
+    "httpx": ["httpcore", "anyio", "certifi", "idna", "sniffio", "h11"],
+    "requests": ["urllib3", "certifi", "idna", "charset_normalizer"],
+    "jinja2": ["markupsafe"],
+}
+
+# Import-from names are verified against the backend's own copy of these packages
+INTROSPECTABLE = {"fastapi", "starlette", "pydantic"}
+
+
+@dataclass
+class Finding:
+    path: str
+    line: Optional[int]
+    message: str
+
+    def __str__(self) -> str:
+        where = f"{self.path}:{self.line}" if self.line else self.path
+        return f"{where}: {self.message}"
+
+
+def format_findings(findings: Iterable[Finding]) -> str:
+    return "Static pre-flight found problems:\n" + "\n".join(f"- {f}" for f in findings)
+
+
+def planned_modules(req_text: str) -> set[str]:
+    """
+    Top-level import names the venv will provide once requirements.txt (plus the
+    sandbox base packages) is installed.
+    """
+    dists = {normalize_requirement_name(p) for p in settings.SANDBOX_BASE_PACKAGES}
+    for line in req_text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line and not line.startswith("-"):
+            dists.add(normalize_requirement_name(line))
+
+    modules: set[str] = set()
+    for dist in dists:
+        names = IMPORT_NAMES.get(dist, [dist.replace("-", "_")])
+        modules.update(names)
+        for name in names:
+            modules.update(TRANSITIVE.get(name, []))
+    return modules
+
+
+class _PathEval:
+    """
+    Best-effort evaluation of module-level path expressions such as
+    Path(__file__).resolve().parent / "frontend"; anything else is None.
+    """
+    def __init__(self, file: Path):
+        self.env: Dict[str, object] = {"__file__": str(file)}
+
+    def assign(self, node: ast.Assign) -> None:
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = self.eval(node.value)
+            if value is not None:
+                self.env[node.targets[0].id] = value
+
+    def eval(self, node: ast.AST):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.env.get(node.id)
+        if isinstance(node, ast.Attribute) and node.attr == "parent":
+            base = self.eval(node.value)
+            return base.parent if isinstance(base, Path) else None
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div):
+            left, right = self.eval(node.left), self.eval(node.right)
+            if isinstance(left, Path) and isinstance(right, (str, Path)):
+                return left / right
+            return None
+        if isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            args = [self.eval(a) for a in node.args]
+            if name == "Path" and len(args) == 1 and isinstance(args[0], (str, Path)):
+                return Path(args[0])
+            if name in ("resolve", "absolute") and isinstance(func, ast.Attribute):
+                return self.eval(func.value)
+            if name == "str" and len(args) == 1 and isinstance(args[0], (str, Path)):
+                return str(args[0])
+            if name in ("dirname", "abspath", "realpath", "join") and isinstance(func, ast.Attribute):
+                if any(not isinstance(a, (str, Path)) for a in args) or not args:
+                    return None
+                if name == "join":
+                    return os.path.join(*map(str, args))
+                return os.path.dirname(str(args[0])) if name == "dirname" else str(args[0])
+        return None
+
+
+def _check_imports(tree: ast.AST, rel: str, backend: Path, planned: set[str]) -> List[Finding]:
+    findings = []
+    local = {p.stem for p in backend.glob("*.py")} | {p.name for p in backend.iterdir() if p.is_dir()}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            targets = [(a.name, None) for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            targets = [(node.module, [a.name for a in node.names if a.name != "*"])]
+        else:
+            continue
+        for module, names in targets:
+            top = module.split(".")[0]
+            if top in local or top in sys.stdlib_module_names or top == "__future__":
+                continue
+            if top not in planned:
+                findings.append(Finding(rel, node.lineno, f"imports {top!r}, which is not in requirements.txt"))
+                continue
+            if top not in INTROSPECTABLE:
+                continue
+            try:
+                mod = importlib.import_module(module)
+            except ImportError:
+                findings.append(Finding(rel, node.lineno, f"No module named {module!r}"))
+                continue
+            for name in names or []:
+                is_package = hasattr(mod, "__path__")
+                if not hasattr(mod, name) and not (is_package and importlib.util.find_spec(f"{module}.{name}")):
+                    findings.append(Finding(rel, node.lineno, f"cannot import name {name!r} from {module!r}"))
+    return findings
+
+
+def _read_html_dir(tree: ast.Module, paths: _PathEval) -> Optional[Path]:
+    """
+    Directory that read_html(filename) reads from: the path joined with its parameter.
+    """
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "read_html" and node.args.args:
+            param = node.args.args[0].arg
+            for sub in ast.walk(node):
+                if (
+                    isinstance(sub, ast.BinOp)
+                    and isinstance(sub.op, ast.Div)
+                    and isinstance(sub.right, ast.Name)
+                    and sub.right.id == param
+                ):
+                    base = paths.eval(sub.left)
+                    if isinstance(base, Path):
+                        return base
+    return None
+
+
+def _check_files(tree: ast.Module, rel: str, file: Path, ws: Path) -> List[Finding]:
+    findings = []
+    backend = file.parent
+    paths = _PathEval(file)
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            paths.assign(node)
+    html_dir = _read_html_dir(tree, paths) or ws / FRONTEND_DIR
+
+    def resolve(value) -> Path:
+        p = Path(value)
+        return p if p.is_absolute() else backend / p
+
+    def show(p: Path) -> str:
+        return p.relative_to(ws).as_posix() if ws in p.parents else str(p)
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+        if name == "StaticFiles":
+            arg = next((k.value for k in node.keywords if k.arg == "directory"), node.args[0] if node.args else None)
+            value = paths.eval(arg) if arg is not None else None
+            if value is not None and not resolve(value).is_dir():
+                findings.append(Finding(rel, node.lineno, f"StaticFiles directory does not exist: {show(resolve(value))}"))
+        elif name == "read_html" and node.args and isinstance(node.args[0], ast.Constant):
+            target = html_dir / str(node.args[0].value)
+            if not target.is_file():
+                findings.append(Finding(rel, node.lineno, f"read_html({node.args[0].value!r}) but {show(target)} does not exist"))
+        elif name == "FileResponse" and node.args:
+            value = paths.eval(node.args[0])
+            if value is not None and not resolve(value).is_file():
+                findings.append(Finding(rel, node.lineno, f"FileResponse file does not exist: {show(resolve(value))}"))
+    return findings
+
+
+def preflight(ws: Path) -> List[Finding]:
+    """
+    Static checks on the generated backend that need no venv or server:
+    every .py file parses, every import resolves against the planned environment
+    (stdlib, local modules, requirements.txt), and files referenced by
+    read_html / StaticFiles / FileResponse exist.
+    """
+    backend = ws / BACKEND_DIR
+    if not (backend / "main.py").exists():
+        return [Finding(f"{BACKEND_DIR}/main.py", None, "file is missing")]
+
+    req = ws / REQUIREMENTS
+    planned = planned_modules(req.read_text(encoding="utf-8") if req.exists() else "")
+
+    findings: List[Finding] = []
+    for file in sorted(backend.rglob("*.py")):
+        rel = file.relative_to(ws).as_posix()
+        if any(part.startswith(".") for part in file.relative_to(backend).parts):
+            continue
+        try:
+            tree = ast.parse(file.read_text(encoding="utf-8"), filename=rel)
+        except SyntaxError as e:
+            findings.append(Finding(rel, e.lineno, f"SyntaxError: {e.msg}"))
+            continue
+        findings += _check_imports(tree, rel, backend, planned)
+        findings += _check_files(tree, rel, file, ws)
+    return findings
@@ -0,0 +1,210 @@
+from __future__ import annotations
+import asyncio
+import ast
+import importlib.util
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette import routing
+
+# Third-party packages the backend already has loaded; anything else a generated
+# app imports lives only in its venv, so it needs a dedicated process.
+HOST_PACKAGES = {"fastapi", "starlette", "pydantic", "typing_extensions"}
+# Stdlib modules that reach outside the app (processes, signals, native code)
+UNSAFE_MODULES = {"subprocess", "multiprocessing", "signal", "ctypes", "threading"}
+# Module-level calls that would change the host process for every tenant
+UNSAFE_CALLS = {("os", "chdir"), ("os", "_exit"), ("sys", "exit")}
+# Calls taking a file or directory path. In the shared process a relative path
+# resolves against the backend's working directory, not the app's.
+PATH_CALLS = {"open", "Path", "FileResponse", "StaticFiles", "Jinja2Templates"}
+PATH_KEYWORDS = {"file", "path", "directory"}
+
+MODULE_PREFIX = "_preview_apps"
+
+
+class IncompatibleApp(Exception):
+    """
+    The app cannot be hosted in the shared process; run it on its own instead.
+    """
+
+
+@dataclass
+class HostedApp:
+    run_id: int
+    module: ModuleType
+    app: Starlette
+    client: httpx.AsyncClient
+    port: Optional[int] = None
+    started_at: datetime = field(default_factory=datetime.utcnow)
+
+
+def _import_names(tree: ast.AST):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name.split(".")[0], 0
+        elif isinstance(node, ast.ImportFrom):
+            yield (node.module or "").split(".")[0], node.level
+
+
+def check_compatible(app_dir: Path) -> None:
+    """
+    Static check that backend/main.py is a self-contained app using only the
+    host's packages. Raises IncompatibleApp with the reason otherwise.
+    """
+    main_py = app_dir / "main.py"
+    if not main_py.exists():
+        raise IncompatibleApp("main.py not found")
+    try:
+        tree = ast.parse(main_py.read_text(encoding="utf-8"), filename=str(main_py))
+    except SyntaxError as e:
+        raise IncompatibleApp(f"main.py does not parse: {e}") from e
+
+    for name, level in _import_names(tree):
+        if level > 0 or (app_dir / f"{name}.py").exists() or (app_dir / name).is_dir():
+            raise IncompatibleApp(f"imports local module {name or '.'!r}")
+        if name in UNSAFE_MODULES:
+            raise IncompatibleApp(f"imports {name!r}")
+        if name not in HOST_PACKAGES and name not in sys.stdlib_module_names:
+            raise IncompatibleApp(f"imports {name!r}, which only its venv provides")
+
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)
+            and (node.func.value.id, node.func.attr) in UNSAFE_CALLS
+        ):
+            raise IncompatibleApp(f"calls {node.func.value.id}.{node.func.attr}()")
+        relative = _relative_path_arg(node)
+        if relative is not None:
+            raise IncompatibleApp(f"uses the relative path {relative!r}, which needs the app's own working directory")
+
+
+def _relative_path_arg(node: ast.AST) -> str | None:
+    """
+    The relative path literal passed to open()/Path()/FileResponse()/StaticFiles(...), if any.
+    """
+    if not isinstance(node, ast.Call):
+        return None
+    func = node.func
+    name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+    if name not in PATH_CALLS:
+        return None
+    args = node.args[:1] + [k.value for k in node.keywords if k.arg in PATH_KEYWORDS]
+    for arg in args:
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str) and arg.value and not Path(arg.value).is_absolute():
+            return arg.value
+    return None
+
+
+class PreviewHost:
+    """
+    Hosts many generated apps in this interpreter. Each run's main.py is imported
+    under its own module name (_preview_apps.run_<id>) so apps never share globals,
+    and is served through an in-process ASGI transport instead of a port.
+
+    This is a density optimization, not a sandbox: generated code runs with the
+    backend's privileges, which is why it is opt-in (PREVIEW_HOST_MODE=shared).
+
+    The import (the app's top-level code) runs on a worker thread so it cannot
+    stall the event loop; one that takes over `import_timeout` seconds counts as
+    incompatible.
+    """
+    def __init__(self, import_timeout: float = 30.0):
+        self.import_timeout = import_timeout
+        self._apps: Dict[int, HostedApp] = {}
+
+    def get(self, run_id: int) -> Optional[HostedApp]:
+        return self._apps.get(run_id)
+
+    def run_ids(self) -> list[int]:
+        return list(self._apps)
+
+    @staticmethod
+    def _module_name(run_id: int) -> str:
+        return f"{MODULE_PREFIX}.run_{run_id}"
+
+    def _load(self, run_id: int, app_dir: Path) -> ModuleType:
+        name = self._module_name(run_id)
+        spec = importlib.util.spec_from_file_location(name, app_dir / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        # Registered so pydantic/dataclasses can resolve the module by name
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except SystemExit as e:
+            self._forget(module)
+            raise IncompatibleApp(f"exited during import (SystemExit: {e.code!r})") from e
+        except Exception as e:
+            self._forget(module)
+            raise IncompatibleApp(f"import failed: {type(e).__name__}: {e}") from e
+        return module
+
+    @staticmethod
+    def _forget(module: ModuleType) -> None:
+        # A timed-out import finishing late must not drop a newer mount's module
+        if sys.modules.get(module.__name__) is module:
+            del sys.modules[module.__name__]
+
+    def _prepare(self, run_id: int, app_dir: Path) -> ModuleType:
+        check_compatible(app_dir)
+        return self._load(run_id, app_dir)
+
+    async def mount(self, run_id: int, app_dir: Path) -> HostedApp:
+        """
+        Import and probe the app. Raises IncompatibleApp if it has to run in a dedicated process.
+        """
+        self.unmount(run_id)
+        try:
+            module = await asyncio.wait_for(
+                asyncio.to_thread(self._prepare, run_id, app_dir), self.import_timeout
+            )
+        except asyncio.TimeoutError:
+            # The thread cannot be stopped; drop its half-imported module so a later mount starts clean
+            sys.modules.pop(self._module_name(run_id), None)
+            raise IncompatibleApp(f"import took longer than {self.import_timeout:g}s") from None
+
+        app = getattr(module, "app", None)
+        reason = None
+        if not isinstance(app, Starlette):
+            reason = "main.py has no FastAPI/Starlette `app`"
+        elif app.router.on_startup or app.router.on_shutdown or not isinstance(
+            app.router.lifespan_context, routing._DefaultLifespan
+        ):
+            # The in-process transport does not run lifespan events
+            reason = "app has startup/shutdown handlers"
+        if reason:
+            self._forget(module)
+            raise IncompatibleApp(reason)
+
+        hosted = HostedApp(
+            run_id=run_id,
+            module=module,
+            app=app,
+            client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://preview"),
+        )
+        self._apps[run_id] = hosted
+        try:
+            r = await hosted.client.get("/")
+        except Exception as e:
+            self.unmount(run_id)
+            raise IncompatibleApp(f"GET / raised {type(e).__name__}: {e}") from e
+        if r.status_code >= 500:
+            self.unmount(run_id)
+            raise IncompatibleApp(f"GET / returned {r.status_code}")
+        return hosted
+
+    def unmount(self, run_id: int) -> bool:
+        # ASGITransport holds no connections, so dropping the client is enough
+        hosted = self._apps.pop(run_id, None)
+        if hosted is None:
+            return False
+        sys.modules.pop(hosted.module.__name__, None)
+        return True
@@ -0,0 +1,195 @@
+from __future__ import annotations
+import asyncio
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from app.core.config import settings
+from app.services.sandbox.base import ExecResult
+from app.services.sandbox.supervisor import PreviewProcess, PreviewSupervisor
+from app.services.preview_host import HostedApp, IncompatibleApp, PreviewHost
+
+Preview = Union[PreviewProcess, HostedApp]
+
+
+class PreviewError(RuntimeError):
+    """
+    A preview was requested but the app did not come up.
+    """
+
+
+class PreviewManager:
+    """
+    Scale-to-zero front for the PreviewSupervisor.
+
+    - Apps are started lazily by ensure() when a preview is requested, reusing the
+      run's existing venv, so a cold start is just a uvicorn boot.
+    - Every access marks the app as recently used; apps idle longer than
+      PREVIEW_IDLE_SECONDS are stopped by a background reaper.
+    - At most PREVIEW_MAX_LIVE apps run at once; starting another one first stops
+      the least recently used.
+    - With a PreviewHost, ensure() first tries to serve the app inside the shared
+      interpreter and only falls back to a dedicated process if it is incompatible.
+    """
+    def __init__(
+        self,
+        supervisor: PreviewSupervisor,
+        host: PreviewHost | None = None,
+        max_live: int | None = None,
+        idle_seconds: float | None = None,
+    ):
+        self.supervisor = supervisor
+        self.host = host
+        self.max_live = max_live or settings.PREVIEW_MAX_LIVE
+        self.idle_seconds = idle_seconds or settings.PREVIEW_IDLE_SECONDS
+        self._last_used: "OrderedDict[int, float]" = OrderedDict()
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # ensure() calls holding or waiting for each run's lock
+        self._lock_users: Dict[int, int] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self.cold_starts = 0
+        self.evictions = 0
+        self.hosted_starts = 0
+        self.fallbacks = 0
+        self.last_fallback: Optional[dict] = None
+
+    def touch(self, run_id: int) -> None:
+        self._last_used[run_id] = time.monotonic()
+        self._last_used.move_to_end(run_id)
+
+    def _forget(self, run_id: int) -> None:
+        self._last_used.pop(run_id, None)
+
+    def _make_room(self, run_id: int) -> None:
+        for lru in list(self._last_used):
+            if len(self._last_used) < self.max_live:
+                break
+            if lru == run_id:
+                continue
+            self.stop(lru)
+            self.evictions += 1
+
+    async def start(self, run_id: int, workspace: Path, app_dir: Path, host: str, ready_timeout: float) -> ExecResult:
+        """
+        (Re)start an app under the live cap; used by the pipeline and by ensure().
+        """
+        self._make_room(run_id)
+        if self.host is not None:
+            self.host.unmount(run_id)
+        res = await self.supervisor.start(run_id, workspace, app_dir, host=host, ready_timeout=ready_timeout)
+        if res.exit_code == 0:
+            self.touch(run_id)
+        else:
+            self._forget(run_id)
+        return res
+
+    def lookup(self, run_id: int) -> Optional[Preview]:
+        """
+        Live app for a run (marked as used), or None if it has to be started.
+        """
+        entry = self.host.get(run_id) if self.host is not None else None
+        if entry is None:
+            entry = self.supervisor.get(run_id)
+            if entry is None or not self.supervisor.alive(entry):
+                return None
+        self.touch(run_id)
+        return entry
+
+    async def _mount(self, run_id: int, app_dir: Path) -> Optional[HostedApp]:
+        self._make_room(run_id)
+        try:
+            hosted = await self.host.mount(run_id, app_dir)
+        except IncompatibleApp as e:
+            self.fallbacks += 1
+            self.last_fallback = {"run_id": run_id, "reason": str(e)}
+            return None
+        self.hosted_starts += 1
+        return hosted
+
+    async def ensure(self, run_id: int, workspace: Path, app_dir: Path, host: str = "127.0.0.1") -> Preview:
+        """
+        Return the running app for a run, starting it if it was scaled to zero.
+        """
+        lock = self._locks.setdefault(run_id, asyncio.Lock())
+        self._lock_users[run_id] = self._lock_users.get(run_id, 0) + 1
+        try:
+            async with lock:
+                entry = self.lookup(run_id)
+                if entry is None:
+                    self.stop(run_id)
+                    if self.host is not None:
+                        entry = await self._mount(run_id, app_dir)
+                if entry is None:
+                    res = await self.start(run_id, workspace, app_dir, host, settings.PREVIEW_READY_SECONDS)
+                    if res.exit_code != 0:
+                        raise PreviewError(res.stderr or "App failed to start")
+                    self.cold_starts += 1
+                    entry = self.supervisor.get(run_id)
+                self.touch(run_id)
+                return entry
+        finally:
+            self._lock_users[run_id] -= 1
+            if self.lookup(run_id) is None:
+                self._drop_lock(run_id)
+
+    def _drop_lock(self, run_id: int) -> None:
+        # Only once no ensure() holds or waits for it, or a new caller would get a second lock
+        if not self._lock_users.get(run_id):
+            self._locks.pop(run_id, None)
+            self._lock_users.pop(run_id, None)
+
+    def stop(self, run_id: int) -> bool:
+        self._forget(run_id)
+        self._drop_lock(run_id)
+        unmounted = self.host.unmount(run_id) if self.host is not None else False
+        return self.supervisor.stop(run_id) or unmounted
+
+    def reap(self) -> int:
+        """
+        Stop apps idle for longer than idle_seconds. Returns how many were stopped.
+        """
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [run_id for run_id, used in self._last_used.items() if used < cutoff]
+        for run_id in idle:
+            self.stop(run_id)
+        return len(idle)
+
+    async def adopt(self) -> int:
+        adopted = await self.supervisor.adopt()
+        for run_id in self.supervisor.run_ids():
+            self.touch(run_id)
+        return adopted
+
+    async def _reap_loop(self) -> None:
+        interval = max(1.0, min(self.idle_seconds / 4, 30.0))
+        while True:
+            await asyncio.sleep(interval)
+            self.reap()
+
+    def start_reaper(self) -> None:
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def stop_reaper(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+
+    def stats(self) -> dict:
+        return {
+            "live": len(self._last_used),
+            "max_live": self.max_live,
+            "idle_seconds": self.idle_seconds,
+            "cold_starts": self.cold_starts,
+            "evictions": self.evictions,
+            "host_mode": "shared" if self.host is not None else "process",
+            "hosted": len(self.host.run_ids()) if self.host is not None else 0,
+            "hosted_starts": self.hosted_starts,
+            "fallbacks": self.fallbacks,
+            "last_fallback": self.last_fallback,
+        }
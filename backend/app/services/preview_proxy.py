@@ -0,0 +1,194 @@
+from __future__ import annotations
+import re
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from app.core.config import settings
+
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host",
+}
+
+# Generated apps use root-absolute URLs ("/static/app.js", fetch("/api/menu")),
+# so these responses are buffered and rewritten under the /preview/{run_id} prefix.
+REWRITE_TYPES = ("text/html", "javascript", "text/css")
+REWRITE_LIMIT = 2_000_000
+# Root-absolute URLs in URL positions only; other strings starting with "/"
+# (parts.join("/"), pathname === "/") are left alone
+_ROOT_URL = re.compile(
+    rb"""(
+        \b(?:href|src|action|formaction|poster)\s*=\s*["'`]?    # HTML attributes, el.src = "..."
+      | \burl\(\s*["']?                                         # CSS url(...)
+      | @import\s+["']                                           # CSS @import "..."
+      | \bfetch\(\s*["'`]                                        # fetch("...")
+      | \.open\(\s*["'`]\w+["'`]\s*,\s*["'`]                     # XMLHttpRequest.open("GET", "...")
+    )/(?!/)""",
+    re.X | re.I,
+)
+_LOOPBACK = {"127.0.0.1", "localhost", "0.0.0.0"}
+
+
+def preview_prefix(run_id: int) -> str:
+    return f"/preview/{run_id}"
+
+
+def rewrite_root_urls(body: bytes, prefix: str) -> bytes:
+    """
+    Prefix root-absolute URLs in href/src/action attributes, CSS url()/@import and
+    fetch()/XMLHttpRequest.open() calls; protocol-relative "//host" is left alone.
+    """
+    return _ROOT_URL.sub(lambda m: m.group(1) + prefix.encode() + b"/", body)
+
+
+def _upstream_location(location: str, base_url: str) -> str | None:
+    """
+    Path (plus query) of an absolute redirect back to the app's own address, else None.
+    """
+    loc, base = urlsplit(location), urlsplit(base_url)
+    if not loc.scheme or not loc.netloc:
+        return None
+    same = loc.netloc == base.netloc or (
+        loc.hostname in _LOOPBACK and base.hostname in _LOOPBACK and loc.port == base.port
+    )
+    if not same:
+        return None
+    return (loc.path or "/") + (f"?{loc.query}" if loc.query else "") + (f"#{loc.fragment}" if loc.fragment else "")
+
+
+class PreviewProxy:
+    """
+    Streaming reverse proxy from /preview/{run_id}/... to a generated app's
+    local port, over one pooled keep-alive client shared by all previews.
+    """
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.PREVIEW_PROXY_TIMEOUT, connect=5),
+                limits=httpx.Limits(
+                    max_connections=settings.PREVIEW_PROXY_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.PREVIEW_PROXY_MAX_CONNECTIONS,
+                ),
+                follow_redirects=False,
+            )
+        return self._client
+
+    @staticmethod
+    def _request_headers(request: Request, prefix: str) -> list[tuple[str, str]]:
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP]
+        # Bodies may be rewritten, so keep upstream responses uncompressed
+        headers = [(k, v) for k, v in headers if k.lower() != "accept-encoding"]
+        headers.append(("accept-encoding", "identity"))
+        headers.append(("x-forwarded-prefix", prefix))
+        if request.client:
+            headers.append(("x-forwarded-for", request.client.host))
+        return headers
+
+    @staticmethod
+    def _copy_headers(upstream: httpx.Response, response: Response, prefix: str, base_url: str) -> Response:
+        # Appended one by one so repeated headers (Set-Cookie) survive
+        own = set(response.headers.keys())
+        for k, v in upstream.headers.multi_items():
+            lk = k.lower()
+            if lk in HOP_BY_HOP or lk in own:
+                continue
+            if lk == "location":
+                local = _upstream_location(v, base_url)
+                if local is not None:
+                    v = prefix + local
+                elif v.startswith("/") and not v.startswith("//"):
+                    v = prefix + v
+            response.headers.append(k, v)
+        return response
+
+    @staticmethod
+    async def _read_capped(chunks: AsyncIterator[bytes]) -> tuple[bytes, bool]:
+        """
+        Buffer up to REWRITE_LIMIT bytes; the flag says whether the body ended within it.
+        """
+        body = bytearray()
+        async for chunk in chunks:
+            body += chunk
+            if len(body) > REWRITE_LIMIT:
+                return bytes(body), False
+        return bytes(body), True
+
+    async def forward(
+        self,
+        request: Request,
+        run_id: int,
+        path: str,
+        base_url: str,
+        client: httpx.AsyncClient | None = None,
+    ) -> Response:
+        """
+        Forward to `base_url`; `client` overrides the pooled client (e.g. an
+        in-process ASGI transport for apps hosted in the backend).
+        """
+        prefix = preview_prefix(run_id)
+        url = f"{base_url}/{path}"
+        if request.url.query:
+            url += "?" + request.url.query
+
+        has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+        client = client or self._get_client()
+        req = client.build_request(
+            request.method,
+            url,
+            headers=self._request_headers(request, prefix),
+            content=request.stream() if has_body else None,
+        )
+        try:
+            upstream = await client.send(req, stream=True)
+        except httpx.TransportError as e:
+            return Response(f"Preview upstream unavailable: {e}", status_code=502)
+
+        content_type = upstream.headers.get("content-type", "")
+        length = upstream.headers.get("content-length")
+        rewritable = (
+            any(t in content_type for t in REWRITE_TYPES)
+            and upstream.headers.get("content-encoding", "identity") == "identity"
+            and request.method != "HEAD"
+            and (length is None or int(length) <= REWRITE_LIMIT)
+        )
+        chunks = upstream.aiter_raw()
+        if rewritable:
+            # Chunked bodies have no length up front, so the cap is enforced while reading
+            try:
+                head, complete = await self._read_capped(chunks)
+            except BaseException:
+                await upstream.aclose()
+                raise
+            if complete:
+                await upstream.aclose()
+                body = rewrite_root_urls(head, prefix)
+                response = Response(body, status_code=upstream.status_code)
+                return self._copy_headers(upstream, response, prefix, base_url)
+
+            async def rest(tail: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+                # Too big to rewrite: send what was read, then stream the remainder as is
+                yield head
+                async for chunk in tail:
+                    yield chunk
+
+            chunks = rest(chunks)
+
+        response = StreamingResponse(
+            chunks,
+            status_code=upstream.status_code,
+            background=BackgroundTask(upstream.aclose),
+        )
+        return self._copy_headers(upstream, response, prefix, base_url)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,353 @@
+from __future__ import annotations
+import ast
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from app.services.preflight import BACKEND_DIR, FRONTEND_DIR, Finding, _PathEval
+
+HTTP_METHODS = {"get", "post", "put", "patch", "delete"}
+
+_FETCH = re.compile(r"""fetch\(\s*(["'`])(.+?)\1""")
+_FETCH_METHOD = re.compile(r"""method\s*:\s*["'`](\w+)["'`]""")
+_TEMPLATE_EXPR = re.compile(r"\$\{[^}]*\}")
+
+
+@dataclass
+class Route:
+    method: str
+    path: str
+    pattern: re.Pattern = field(repr=False)
+
+
+@dataclass
+class Served:
+    """
+    What the backend serves, read from route decorators and app.mount(StaticFiles).
+    """
+    routes: List[Route] = field(default_factory=list)
+    mounts: Dict[str, Path] = field(default_factory=dict)
+    # html file name -> route serving it via read_html/FileResponse
+    pages: Dict[str, str] = field(default_factory=dict)
+    catch_all: bool = False
+
+    def methods_for(self, path: str) -> set[str]:
+        return {r.method for r in self.routes if r.pattern.fullmatch(path)}
+
+    def mount_for(self, path: str) -> Optional[Tuple[str, Path]]:
+        for prefix, directory in sorted(self.mounts.items(), key=lambda m: -len(m[0])):
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return prefix, directory
+        return None
+
+
+@dataclass
+class Reference:
+    file: str
+    line: int
+    kind: str          # "link", "asset", "form", "api"
+    url: str
+    method: str = "GET"
+
+
+def _route_pattern(path: str) -> re.Pattern:
+    parts = []
+    for piece in re.split(r"(\{[^}]+\})", path):
+        if piece.startswith("{") and piece.endswith("}"):
+            parts.append(".+" if piece.endswith(":path}") else "[^/]+")
+        else:
+            parts.append(re.escape(piece))
+    return re.compile("".join(parts).rstrip("/") + "/?")
+
+
+def _str_arg(call: ast.Call, index: int | None = 0, keyword: str | None = None) -> Optional[str]:
+    node = next((k.value for k in call.keywords if k.arg == keyword), None) if keyword else None
+    if node is None and index is not None and len(call.args) > index:
+        node = call.args[index]
+    return node.value if isinstance(node, ast.Constant) and isinstance(node.value, str) else None
+
+
+# (module stem, variable name) of an app or APIRouter
+_RouterKey = Tuple[str, str]
+
+
+def _methods_arg(call: ast.Call, default: List[str]) -> List[str]:
+    listed = next((k.value for k in call.keywords if k.arg == "methods"), None)
+    return [
+        e.value.lower() for e in getattr(listed, "elts", [])
+        if isinstance(e, ast.Constant) and isinstance(e.value, str)
+    ] or default
+
+
+class _Module:
+    """
+    One parsed backend module plus what its names refer to in other modules.
+    """
+    def __init__(self, file: Path, tree: ast.Module):
+        self.file = file
+        self.tree = tree
+        self.stem = file.stem
+        self.names: Dict[str, _RouterKey] = {}   # from m import router as r -> r: (m, router)
+        self.modules: Dict[str, str] = {}        # import m as alias -> alias: m
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module:
+                module = node.module.split(".")[-1]
+                for a in node.names:
+                    self.names[a.asname or a.name] = (module, a.name)
+            elif isinstance(node, ast.ImportFrom):
+                # from . import routes
+                for a in node.names:
+                    self.modules[a.asname or a.name] = a.name
+            elif isinstance(node, ast.Import):
+                for a in node.names:
+                    self.modules[a.asname or a.name.split(".")[0]] = a.name.split(".")[-1]
+
+    def resolve(self, node: ast.AST) -> Optional[_RouterKey]:
+        if isinstance(node, ast.Name):
+            return self.names.get(node.id, (self.stem, node.id))
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in self.modules:
+            return self.modules[node.value.id], node.attr
+        return None
+
+
+def _route_prefixes(
+    key: _RouterKey,
+    own: Dict[_RouterKey, str],
+    included: Dict[_RouterKey, List[Tuple[_RouterKey, str]]],
+    depth: int = 0,
+) -> List[str]:
+    """
+    Every prefix a router's routes are served under: its APIRouter(prefix=...)
+    behind each include_router(..., prefix=...) chain up to the app.
+    """
+    prefix = own.get(key, "")
+    parents = included.get(key)
+    if not parents or depth > 5:
+        return [prefix]
+    return [
+        outer + inc + prefix
+        for parent, inc in parents
+        for outer in _route_prefixes(parent, own, included, depth + 1)
+    ]
+
+
+def read_served(ws: Path) -> Served:
+    """
+    Collect routes and static mounts from every backend module (best effort, AST only).
+    Router prefixes come from APIRouter(prefix=...) and include_router(..., prefix=...).
+    """
+    served = Served()
+    backend = ws / BACKEND_DIR
+    modules: List[_Module] = []
+    for file in sorted(backend.glob("*.py")):
+        try:
+            modules.append(_Module(file, ast.parse(file.read_text(encoding="utf-8"))))
+        except SyntaxError:
+            continue
+
+    own: Dict[_RouterKey, str] = {}
+    included: Dict[_RouterKey, List[Tuple[_RouterKey, str]]] = {}
+    for mod in modules:
+        for node in mod.tree.body:
+            if (
+                isinstance(node, ast.Assign)
+                and isinstance(node.value, ast.Call)
+                and getattr(node.value.func, "id", None) == "APIRouter"
+            ):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        own[(mod.stem, target.id)] = _str_arg(node.value, None, "prefix") or ""
+        for node in ast.walk(mod.tree):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "include_router"
+                and node.args
+            ):
+                parent, child = mod.resolve(node.func.value), mod.resolve(node.args[0])
+                if parent is not None and child is not None:
+                    included.setdefault(child, []).append((parent, _str_arg(node, None, "prefix") or ""))
+
+    def add_route(mod: _Module, owner: ast.AST, route: str, methods: List[str]) -> List[str]:
+        key = mod.resolve(owner)
+        full = [p + route for p in _route_prefixes(key, own, included)] if key else [route]
+        for path in full:
+            for m in methods:
+                served.routes.append(Route(m.upper(), path, _route_pattern(path)))
+            if ":path}" in path:
+                served.catch_all = True
+        return full
+
+    for mod in modules:
+        paths = _PathEval(mod.file)
+        for node in mod.tree.body:
+            if isinstance(node, ast.Assign):
+                paths.assign(node)
+
+        for node in ast.walk(mod.tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                for dec in node.decorator_list:
+                    if not (isinstance(dec, ast.Call) and isinstance(dec.func, ast.Attribute)):
+                        continue
+                    methods = [dec.func.attr] if dec.func.attr in HTTP_METHODS else []
+                    if dec.func.attr == "api_route":
+                        methods = _methods_arg(dec, ["get"])
+                    route = _str_arg(dec)
+                    if route is None or not methods:
+                        continue
+                    full = add_route(mod, dec.func.value, route, methods)
+                    for sub in ast.walk(node):
+                        if isinstance(sub, ast.Call) and getattr(sub.func, "id", None) in ("read_html", "FileResponse"):
+                            target = _str_arg(sub)
+                            if target is None and sub.args:
+                                value = paths.eval(sub.args[0])
+                                target = str(value) if value is not None else None
+                            if target:
+                                served.pages.setdefault(Path(target).name, full[0])
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "add_api_route":
+                route = _str_arg(node, 0, "path")
+                if route is not None:
+                    add_route(mod, node.func.value, route, _methods_arg(node, ["get"]))
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "mount":
+                prefix = _str_arg(node)
+                app_arg = node.args[1] if len(node.args) > 1 else next((k.value for k in node.keywords if k.arg == "app"), None)
+                if prefix is None or not (isinstance(app_arg, ast.Call) and getattr(app_arg.func, "id", None) == "StaticFiles"):
+                    continue
+                directory = next((k.value for k in app_arg.keywords if k.arg == "directory"), app_arg.args[0] if app_arg.args else None)
+                value = paths.eval(directory) if directory is not None else None
+                if value is not None:
+                    p = Path(value)
+                    served.mounts[prefix] = p if p.is_absolute() else backend / p
+    return served
+
+
+class _RefParser(HTMLParser):
+    def __init__(self, file: str):
+        super().__init__()
+        self.file = file
+        self.refs: List[Reference] = []
+        self.scripts: List[Tuple[int, str]] = []
+        self._in_script = False
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        line = self.getpos()[0]
+        if tag == "a" and a.get("href"):
+            self.refs.append(Reference(self.file, line, "link", a["href"]))
+        elif tag == "link" and a.get("href"):
+            rel = (a.get("rel") or "").lower()
+            if "stylesheet" in rel or "icon" in rel:
+                self.refs.append(Reference(self.file, line, "asset", a["href"]))
+        elif tag in ("script", "img") and a.get("src"):
+            self.refs.append(Reference(self.file, line, "asset", a["src"]))
+        elif tag == "form" and a.get("action"):
+            self.refs.append(Reference(self.file, line, "form", a["action"], (a.get("method") or "GET").upper()))
+        self._in_script = tag == "script" and not a.get("src")
+
+    def handle_endtag(self, tag):
+        if tag == "script":
+            self._in_script = False
+
+    def handle_data(self, data):
+        if self._in_script:
+            self.scripts.append((self.getpos()[0], data))
+
+
+def scan_js(file: str, text: str, first_line: int = 1) -> List[Reference]:
+    """
+    fetch("...") calls with their method; template-literal parts inside the path
+    become a segment. URLs built on an interpolated base (`${API}/menu`) are skipped:
+    where they point is not known statically.
+    """
+    refs = []
+    for m in _FETCH.finditer(text):
+        if m.group(2).startswith("${"):
+            continue
+        url = _TEMPLATE_EXPR.sub("x", m.group(2))
+        # The options object (if any) sits between this call and the next fetch
+        nxt = text.find("fetch(", m.end())
+        window = text[m.end(): nxt if nxt != -1 else m.end() + 400][:400]
+        method = _FETCH_METHOD.search(window)
+        line = first_line + text.count("\n", 0, m.start())
+        refs.append(Reference(file, line, "api", url, method.group(1).upper() if method else "GET"))
+    return refs
+
+
+def read_references(ws: Path) -> List[Reference]:
+    frontend = ws / FRONTEND_DIR
+    refs: List[Reference] = []
+    if not frontend.is_dir():
+        return refs
+    for file in sorted(frontend.rglob("*")):
+        rel = file.relative_to(ws).as_posix()
+        if file.suffix == ".html":
+            parser = _RefParser(rel)
+            try:
+                parser.feed(file.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            refs += parser.refs
+            for line, code in parser.scripts:
+                refs += scan_js(rel, code, line)
+        elif file.suffix == ".js":
+            refs += scan_js(rel, file.read_text(encoding="utf-8", errors="replace"))
+    return refs
+
+
+def _local_path(url: str, base: str) -> Optional[str]:
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or url.startswith(("#", "data:", "mailto:", "javascript:")):
+        return None
+    return urlsplit(urljoin("http://app" + base, url)).path or "/"
+
+
+def _show(p: Path, ws: Path) -> str:
+    return p.relative_to(ws).as_posix() if ws in p.parents else str(p)
+
+
+def format_hints(findings: List[Finding]) -> str:
+    return "Static reference check (may be wrong; verify before changing code):\n" + "\n".join(f"- {f}" for f in findings)
+
+
+def lint_references(ws: Path) -> List[Finding]:
+    """
+    Cross-check frontend references against what the backend serves:
+    dangling page links, missing static assets and API calls with no matching route.
+    """
+    if not (ws / BACKEND_DIR / "main.py").exists():
+        return []
+    served = read_served(ws)
+    findings: List[Finding] = []
+    for ref in read_references(ws):
+        # Relative URLs resolve against the route that serves the file (JS: the page root)
+        name = Path(ref.file).name
+        base = served.pages.get(name, "/")
+        if name.endswith(".js"):
+            base = "/"
+        path = _local_path(ref.url, base)
+        if path is None:
+            continue
+
+        mount = served.mount_for(path)
+        if mount is not None:
+            prefix, directory = mount
+            rel = path[len(prefix.rstrip("/")):].lstrip("/")
+            if not (directory / rel).is_file():
+                findings.append(Finding(ref.file, ref.line, f"{ref.kind} {ref.url!r}: {prefix} serves {_show(directory, ws)}, which has no {rel!r}"))
+            continue
+
+        methods = served.methods_for(path)
+        if served.catch_all or ref.method in methods:
+            continue
+        if methods:
+            findings.append(Finding(ref.file, ref.line, f"{ref.kind} {ref.method} {ref.url!r}: backend serves this path only for {', '.join(sorted(methods))}"))
+        elif ref.kind == "api":
+            findings.append(Finding(ref.file, ref.line, f"unserved API call {ref.method} {ref.url!r}: no matching route in the backend"))
+        elif ref.kind == "asset":
+            findings.append(Finding(ref.file, ref.line, f"missing asset {ref.url!r}: not under a static mount and no route serves it"))
+        else:
+            findings.append(Finding(ref.file, ref.line, f"dangling {ref.kind} {ref.url!r}: no route serves {path}"))
+    return findings
@@ -3,23 +3,36 @@ from app.services.llm.base import LLMClient
 
 SYSTEM_REPAIR = """You are a code repair agent.
 Given runtime errors and file context, output a patch to fix the code.
+Change only what the error needs; do not re-emit unchanged code.
 
 Rules:
 1. Start output with: *** Begin Patch
 2. For each file to change, start with: *** Update File: path/to/file
-3. Then output the NEW CONTENT of the file (complete file), prefixed with: +++ REPLACE ENTIRE FILE +++
-(We use full file replacement to avoid diff errors)
-4. End output with: *** End Patch
+   Then one or more hunks. Each hunk starts with "@@" (optionally followed by
+   the def/class line it is in), then lines prefixed with:
+     " " (space) for unchanged context lines, copied exactly from the file
+     "-" for lines to remove
+     "+" for lines to add
+   Give 2-3 context lines before and after each change.
+3. To create a file: *** Add File: path/to/file  then every line prefixed with "+"
+4. To delete a file: *** Delete File: path/to/file
+5. To rename a file, put "*** Move to: new/path" right after its Update File line.
+6. End output with: *** End Patch
+Context marked "excerpt" omits unchanged parts of a file; only patch lines you can see.
 
 Example:
 *** Begin Patch
 *** Update File: generated_app/backend/main.py
-+++ REPLACE ENTIRE FILE +++
-from fastapi import FastAPI
-...
+@@ def create_order(payload: dict):
+ def create_order(payload: dict):
+-    items = payload["items"]
++    items = payload.get("items", [])
+     return {"status": "ok", "items": items}
 *** End Patch
 """
 
-async def llm_repair(llm: LLMClient, model: str, error_text: str, context: str) -> str:
-    user = f"ERROR:\n{error_text}\n\nCONTEXT:\n{context}\n\nReturn ONLY unified diff patch."
-    return await llm.chat(model=model, system=SYSTEM_REPAIR, user=user)
+async def llm_repair(
+    llm: LLMClient, model: str, error_text: str, context: str, temperature: float | None = None
+) -> str:
+    user = f"ERROR:\n{error_text}\n\nCONTEXT:\n{context}\n\nReturn ONLY the patch."
+    return await llm.chat(model=model, system=SYSTEM_REPAIR, user=user, temperature=temperature)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import difflib
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import repo
+from app.db.models import RepairCacheEntry
+from app.services.preflight import BACKEND_DIR
+
+APP_ROOT = "generated_app"
+CONTEXT_LINES = 2
+SNAPSHOT_SUFFIXES = {".py", ".txt", ".html", ".css", ".js", ".json", ".md"}
+
+_EXC_LINE = re.compile(r"^\s*(?:\[\w+\]\s*)?([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt))\b:?\s*(.*)$")
+# Runs after normalize_error: app paths are relative (probe) or start at generated_app/
+# (uvicorn); absolute, <site>/ and <frozen ...> frames belong to Python or libraries
+_APP_FRAME = re.compile(r'File "([^"/<][^"]*\.py)", line (?:\d+|N), in (\S+)')
+_KEEP_LINE = re.compile(r"^\s*(?:- |Request: |Problem: )")
+
+
+def normalize_error(text: str) -> str:
+    """
+    Strip what varies between runs of the same failure: absolute workspace paths,
+    line numbers, addresses, timings and ports.
+    """
+    text = re.sub(r'[^\s"]*/(generated_app/)', r"\1", text)
+    text = re.sub(r"/\S+/site-packages/", "<site>/", text)
+    text = re.sub(r"\bline \d+", "line N", text)
+    text = re.sub(r"(\.\w+):\d+(?=:)", r"\1:N", text)
+    text = re.sub(r"0x[0-9a-fA-F]+", "0x?", text)
+    text = re.sub(r"\d+(?:\.\d+)?\s*(?:ms|s)\b", "N ms", text)
+    text = re.sub(r"(127\.0\.0\.1|localhost|0\.0\.0\.0):\d+", r"\1:PORT", text)
+    return text
+
+
+def error_signature(text: str) -> str:
+    """
+    The lines that identify a failure: exception type + message, the failing
+    app frames (file and function, not line), and pre-flight / route-check problems.
+    """
+    norm = normalize_error(text)
+    keep: List[str] = []
+    exc_lines = [m for m in (_EXC_LINE.match(l) for l in norm.splitlines()) if m]
+    if exc_lines:
+        # The last exception in a chained traceback is the one that surfaced
+        keep.append(f"{exc_lines[-1].group(1)}: {exc_lines[-1].group(2).strip()}")
+    frames = [
+        f"{m.group(1).removeprefix(BACKEND_DIR + '/')}:{m.group(2)}"
+        for m in _APP_FRAME.finditer(norm)
+        if "site-packages" not in m.group(1)
+    ]
+    if frames:
+        keep.append("at " + frames[-1])
+    keep += [l.strip() for l in norm.splitlines() if _KEEP_LINE.match(l)]
+    if not keep:
+        keep = [l.strip() for l in norm.splitlines() if l.strip()][-5:]
+    # Order-insensitive for multi-finding reports
+    head, rest = keep[:1], sorted(set(keep[1:]))
+    return "\n".join(head + rest)
+
+
+def fingerprint(text: str) -> Tuple[str, str]:
+    signature = error_signature(text)
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()[:32], signature
+
+
+def snapshot(ws: Path) -> Dict[str, str]:
+    """
+    Text contents of the generated app, keyed by workspace-relative path.
+    """
+    root = ws / APP_ROOT
+    files = {}
+    for p in root.rglob("*"):
+        if p.is_file() and p.suffix in SNAPSHOT_SUFFIXES:
+            try:
+                files[p.relative_to(ws).as_posix()] = p.read_text(encoding="utf-8")
+            except UnicodeDecodeError:
+                continue
+    return files
+
+
+def edits_between(before: Dict[str, str], after: Dict[str, str]) -> List[dict]:
+    """
+    Context-anchored edits turning `before` into `after`: each {path, old, new}
+    replaces one exact block (changed lines plus CONTEXT_LINES around them).
+    old=None creates a file, new=None deletes it.
+    """
+    edits: List[dict] = []
+    for path in sorted(set(before) | set(after)):
+        a, b = before.get(path), after.get(path)
+        if a == b:
+            continue
+        if a is None or b is None:
+            edits.append({"path": path, "old": None if a is None else a, "new": b})
+            continue
+        a_lines = a.splitlines(keepends=True)
+        b_lines = b.splitlines(keepends=True)
+        matcher = difflib.SequenceMatcher(a=a_lines, b=b_lines, autojunk=False)
+        for group in matcher.get_grouped_opcodes(CONTEXT_LINES):
+            i1, i2 = group[0][1], group[-1][2]
+            j1, j2 = group[0][3], group[-1][4]
+            edits.append({"path": path, "old": "".join(a_lines[i1:i2]), "new": "".join(b_lines[j1:j2])})
+    return edits
+
+
+def restore(ws: Path, files: Dict[str, str]) -> None:
+    """
+    Put the generated app back to a snapshot: rewrite changed files and remove
+    snapshot-type files that were added since.
+    """
+    current = snapshot(ws)
+    for rel in current.keys() - files.keys():
+        (ws / rel).unlink(missing_ok=True)
+    for rel, text in files.items():
+        if current.get(rel) != text:
+            target = ws / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(text, encoding="utf-8")
+
+
+def apply_edits(ws: Path, edits: List[dict]) -> bool:
+    """
+    All-or-nothing: every `old` block must occur exactly once in the current file
+    (or the file must be absent for a create). Returns False and changes nothing otherwise.
+    """
+    pending: Dict[str, Optional[str]] = {}
+    for e in edits:
+        path = e["path"]
+        if not path.startswith(APP_ROOT + "/") or ".." in Path(path).parts:
+            return False
+        target = ws / path
+        current = pending[path] if path in pending else (target.read_text(encoding="utf-8") if target.exists() else None)
+        if e["old"] is None:
+            if current is not None:
+                return False
+            pending[path] = e["new"]
+        elif current is None:
+            return False
+        elif e["new"] is None:
+            if current != e["old"]:
+                return False
+            pending[path] = None
+        else:
+            if current.count(e["old"]) != 1:
+                return False
+            pending[path] = current.replace(e["old"], e["new"], 1)
+
+    for path, content in pending.items():
+        target = ws / path
+        if content is None:
+            target.unlink(missing_ok=True)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(content, encoding="utf-8")
+    return True
+
+
+class RepairCache:
+    """
+    Replays repairs that fixed the same error signature on earlier runs.
+    Lookups and hits are counted in-process; per-entry outcomes are persisted.
+    """
+    def __init__(self, max_entries: int | None = None):
+        self.max_entries = settings.REPAIR_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.lookups = 0
+        self.hits = 0
+        self.replayed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(self, session: Session, fp: str) -> Optional[RepairCacheEntry]:
+        if not self.enabled:
+            return None
+        self.lookups += 1
+        entry = repo.get_repair_entry(session, fp)
+        if entry is not None:
+            self.hits += 1
+            repo.record_repair_hit(session, entry)
+        return entry
+
+    def replay(self, ws: Path, entry: RepairCacheEntry) -> bool:
+        """
+        Apply the cached edits; False (nothing changed) if they don't fit this code.
+        """
+        ok = apply_edits(ws, json.loads(entry.edits))
+        self.replayed += ok
+        return ok
+
+    def record_outcome(self, session: Session, entry: RepairCacheEntry, ok: bool) -> None:
+        repo.record_repair_outcome(session, entry, ok)
+        if not ok:
+            repo.evict_repair_entries(session, self.max_entries)
+
+    def store(self, session: Session, fp: str, signature: str, before: Dict[str, str], after: Dict[str, str]) -> bool:
+        if not self.enabled:
+            return False
+        edits = edits_between(before, after)
+        if not edits:
+            return False
+        repo.save_repair_entry(session, fp, signature, json.dumps(edits))
+        repo.evict_repair_entries(session, self.max_entries)
+        return True
+
+    def stats(self, session: Session) -> dict:
+        totals = repo.repair_cache_totals(session)
+        return {
+            "max_entries": self.max_entries,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "replayed": self.replayed,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            **{f"total_{k}": v for k, v in totals.items()},
+        }
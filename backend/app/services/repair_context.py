@@ -0,0 +1,290 @@
+from __future__ import annotations
+import ast
+import posixpath
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.preflight import BACKEND_DIR, FRONTEND_DIR, REQUIREMENTS
+from app.services.reflint import HTTP_METHODS, _route_pattern
+from app.services.repair_cache import APP_ROOT, snapshot
+
+# No tokenizer for every backend model; ~4 characters per token is close enough for code
+CHARS_PER_TOKEN = 4
+# Lines kept around an error location when a non-Python file has to be cut
+WINDOW_LINES = 20
+
+_FRAME = re.compile(r'File "([^"]+)", line (\d+), in (\S+)')
+_FINDING = re.compile(r"((?:[\w.-]+/)*[\w.-]+\.(?:py|html|js|css|txt|json)):(\d+)(?=:)")
+_REQUEST = re.compile(r"\b(?:GET|POST|PUT|PATCH|DELETE|HEAD) (/[^\s'\"`]*)")
+
+# Always worth showing when the error names nothing more specific
+BACKBONE = [f"{BACKEND_DIR}/main.py", REQUIREMENTS]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class Focus:
+    """
+    What the error points at inside one file.
+    """
+    lines: Set[int] = field(default_factory=set)
+    names: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class RepairContext:
+    text: str
+    # (path, "full" | "excerpt" | "truncated") in prompt order
+    files: List[Tuple[str, str]]
+    tokens: int
+
+    def describe(self) -> str:
+        shown = ", ".join(p if mode == "full" else f"{p} ({mode})" for p, mode in self.files)
+        return f"~{self.tokens} tokens: {shown or 'no files'}"
+
+
+def _resolve(raw: str, files: Dict[str, str]) -> Optional[str]:
+    """
+    Map a path from a traceback or finding to a workspace-relative snapshot key.
+    Probe frames are relative to the backend dir, uvicorn frames are absolute.
+    """
+    raw = raw.replace("\\", "/")
+    if "site-packages" in raw or raw.startswith("<"):
+        return None
+    i = raw.find(APP_ROOT + "/")
+    if i != -1:
+        key = raw[i:]
+        return key if key in files else None
+    for base in (BACKEND_DIR, FRONTEND_DIR):
+        key = posixpath.normpath(f"{base}/{raw}")
+        if key in files:
+            return key
+    return None
+
+
+def _located(error: str, files: Dict[str, str]) -> Tuple[List[str], Dict[str, Focus]]:
+    """
+    Files named by traceback frames and findings, innermost frame first.
+    """
+    order: List[str] = []
+    focus: Dict[str, Focus] = {}
+    hits: List[Tuple[str, int, Optional[str]]] = []
+    for m in _FRAME.finditer(error):
+        hits.append((m.group(1), int(m.group(2)), m.group(3)))
+    # The innermost frame is the last one printed
+    hits.reverse()
+    hits += [(m.group(1), int(m.group(2)), None) for m in _FINDING.finditer(error)]
+    for raw, line, name in hits:
+        key = _resolve(raw, files)
+        if key is None:
+            continue
+        if key not in focus:
+            order.append(key)
+            focus[key] = Focus()
+        focus[key].lines.add(line)
+        if name and name != "<module>":
+            focus[key].names.add(name)
+    return order, focus
+
+
+def _module_name(rel: str) -> Optional[str]:
+    if not rel.startswith(BACKEND_DIR + "/") or not rel.endswith(".py"):
+        return None
+    return rel[len(BACKEND_DIR) + 1:-3].replace("/", ".")
+
+
+def _imports(text: str) -> Set[str]:
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module)
+            names.update(f"{node.module}.{a.name}" for a in node.names)
+    return names
+
+
+def _dependents(targets: List[str], files: Dict[str, str]) -> List[str]:
+    """
+    Python modules importing a target module; for pages, scripts and styles,
+    the files that mention them by name.
+    """
+    modules = {m for m in map(_module_name, targets) if m}
+    basenames = {posixpath.basename(t) for t in targets if not t.endswith(".py")}
+    found = []
+    for rel, text in files.items():
+        if rel in targets:
+            continue
+        if modules and rel.endswith(".py") and modules & _imports(text):
+            found.append(rel)
+        elif any(b in text for b in basenames):
+            found.append(rel)
+    return found
+
+
+def _mentioned(error: str, files: Dict[str, str]) -> List[str]:
+    return [
+        rel for rel in files
+        if re.search(rf"(?<![\w.-]){re.escape(posixpath.basename(rel))}(?![\w-])", error)
+    ]
+
+
+def rank_files(error: str, files: Dict[str, str]) -> Tuple[List[str], Dict[str, Focus]]:
+    """
+    Files named in the traceback (innermost first), then the files that import them,
+    then files the error mentions, then main.py and requirements.txt.
+    """
+    located, focus = _located(error, files)
+    ordered: List[str] = []
+    for tier in (located, _dependents(located, files), _mentioned(error, files), BACKBONE):
+        for rel in tier:
+            if rel in files and rel not in ordered:
+                ordered.append(rel)
+    return ordered, focus
+
+
+def _serves(node: ast.AST, paths: List[str]) -> bool:
+    for dec in getattr(node, "decorator_list", []):
+        if (
+            isinstance(dec, ast.Call)
+            and isinstance(dec.func, ast.Attribute)
+            and (dec.func.attr in HTTP_METHODS or dec.func.attr == "api_route")
+            and dec.args
+            and isinstance(dec.args[0], ast.Constant)
+            and isinstance(dec.args[0].value, str)
+        ):
+            pattern = _route_pattern(dec.args[0].value)
+            if any(pattern.fullmatch(p.split("?", 1)[0]) for p in paths):
+                return True
+    return False
+
+
+def python_excerpt(text: str, focus: Focus, paths: List[str], limit: int) -> Optional[str]:
+    """
+    Function-level slice of a module: module-level statements in full, the
+    functions/classes the error points at (frame lines and names, or the route
+    handling a failing request) in full, every other definition as a stub.
+    If that is still over `limit` characters the stubs are dropped too.
+    """
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return None
+    src = text.splitlines()
+    segments = []  # (start, end, kind, node); 1-based inclusive line ranges
+    prev_end = 0
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        end = node.end_lineno or node.lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            hit = (
+                node.name in focus.names
+                or any(start <= line <= end for line in focus.lines)
+                or _serves(node, paths)
+            )
+            kind = "focus" if hit else "def"
+        else:
+            kind = "keep"
+        # Blank lines and comments above a statement travel with it
+        segments.append((prev_end + 1, end, kind, node))
+        prev_end = end
+
+    def render(stubs: bool) -> str:
+        out: List[str] = []
+        for start, end, kind, node in segments:
+            if kind != "def":
+                out += src[start - 1:end]
+            elif node.body[0].lineno <= node.lineno:
+                out += src[start - 1:end]  # one-liner, nothing to save
+            elif stubs:
+                body_start = node.body[0].lineno
+                head = src[start - 1:body_start - 1]
+                indent = re.match(r"\s*", src[body_start - 1]).group(0)
+                lines = f"line {end}" if body_start == end else f"lines {body_start}-{end}"
+                out += head + [f"{indent}...  # body omitted ({lines})"]
+            else:
+                out.append(f"# ... {node.name} omitted (lines {node.lineno}-{end})")
+        if prev_end < len(src):
+            out += src[prev_end:]
+        return "\n".join(out) + "\n"
+
+    if not any(kind == "def" for _, _, kind, _ in segments):
+        return None
+    for stubs in (True, False):
+        excerpt = render(stubs)
+        if len(excerpt) <= limit:
+            return excerpt
+    return None
+
+
+def text_excerpt(text: str, focus: Focus, limit: int) -> Optional[str]:
+    """
+    Windows of WINDOW_LINES around each error line of a non-Python file.
+    """
+    if not focus.lines:
+        return None
+    src = text.splitlines()
+    keep: Set[int] = set()
+    for line in focus.lines:
+        keep.update(range(max(1, line - WINDOW_LINES), min(len(src), line + WINDOW_LINES) + 1))
+    out, last = [], 0
+    for n in sorted(keep):
+        if n != last + 1:
+            out.append(f"... (lines {last + 1}-{n - 1} omitted)")
+        out.append(src[n - 1])
+        last = n
+    if last < len(src):
+        out.append(f"... (lines {last + 1}-{len(src)} omitted)")
+    excerpt = "\n".join(out) + "\n"
+    return excerpt if len(excerpt) <= limit else None
+
+
+def select_context(ws: Path, error: str, budget_tokens: int) -> RepairContext:
+    """
+    Repair context ranked by relevance to `error` and filled up to `budget_tokens`.
+    Files that do not fit whole are cut down to the parts the error points at;
+    the most relevant file is always included, truncated if need be.
+    """
+    files = snapshot(ws)
+    ordered, focus = rank_files(error, files)
+    paths = _REQUEST.findall(error)
+
+    remaining = budget_tokens * CHARS_PER_TOKEN
+    parts: List[str] = []
+    shown: List[Tuple[str, str]] = []
+    for rel in ordered:
+        text = files[rel]
+        header = f"\n--- FILE: {rel} ---\n"
+        room = remaining - len(header)
+        if room <= 0:
+            break
+        body, mode = text, "full"
+        if len(text) > room:
+            f = focus.get(rel, Focus())
+            header = f"\n--- FILE: {rel} (excerpt; unchanged parts omitted) ---\n"
+            room = remaining - len(header)
+            if rel.endswith(".py"):
+                body = python_excerpt(text, f, paths, room)
+            else:
+                body = text_excerpt(text, f, room)
+            mode = "excerpt"
+            if body is None and not shown:
+                header = f"\n--- FILE: {rel} (truncated) ---\n"
+                body, mode = text[:max(0, remaining - len(header))], "truncated"
+            if body is None:
+                continue
+        parts.append(f"{header}{body}\n")
+        shown.append((rel, mode))
+        remaining -= len(header) + len(body) + 1
+
+    text = "\n".join(parts)
+    return RepairContext(text=text, files=shown, tokens=estimate_tokens(text))
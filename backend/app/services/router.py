@@ -5,6 +5,10 @@ from app.core.config import settings
 @dataclass(frozen=True)
 class ModelChoice:
     model: str
+    # Prompt budget for file context (tokens)
+    context_tokens: int = 0
+    # Sampling temperature; None keeps the provider default
+    temperature: float | None = None
 
 class ModelRouter:
     def spec_model(self) -> ModelChoice:
@@ -14,4 +18,21 @@ class ModelRouter:
         return ModelChoice(settings.MODEL_CODE)
 
     def repair_model(self) -> ModelChoice:
-        return ModelChoice(settings.MODEL_REPAIR)
+        model = settings.MODEL_REPAIR
+        return ModelChoice(model, settings.MODEL_CONTEXT_TOKENS.get(model, settings.REPAIR_CONTEXT_TOKENS))
+
+    def repair_candidates(self, count: int) -> list[ModelChoice]:
+        """
+        One choice per parallel repair candidate, cycling through REPAIR_MODELS
+        (default: the repair model) and REPAIR_TEMPERATURES.
+        """
+        models = settings.REPAIR_MODELS or [settings.MODEL_REPAIR]
+        temperatures = settings.REPAIR_TEMPERATURES or [None]
+        return [
+            ModelChoice(
+                models[i % len(models)],
+                settings.MODEL_CONTEXT_TOKENS.get(models[i % len(models)], settings.REPAIR_CONTEXT_TOKENS),
+                temperatures[i % len(temperatures)],
+            )
+            for i in range(count)
+        ]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Dict
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import repo
+from app.db.database import engine
+from app.db.models import RunJob
+from app.services.executor import RunExecutor
+from app.services.logging_service import log
+
+
+class RunQueueWorker:
+    """
+    Pulls jobs from the durable RunJob table into the RunExecutor.
+
+    Each claimed job holds a lease that is renewed by a heartbeat while the
+    run is in flight. If the process dies, the lease expires and any worker
+    (including this one after a restart) reclaims the job.
+    """
+    def __init__(
+        self,
+        executor: RunExecutor,
+        handler: Callable[[RunJob], Awaitable[None]],
+        owner: str | None = None,
+    ):
+        self.executor = executor
+        self.handler = handler
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._leased: Dict[int, int] = {}  # job_id -> run_id
+        self._stopping = False
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._loop(), name="run-queue")
+
+    def notify(self) -> None:
+        """
+        Wake the dispatcher right away instead of waiting for the next poll.
+        """
+        self._wake.set()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.executor.shutdown()
+        # Jobs whose run never started are handed back here; running ones hand
+        # themselves back as they are cancelled
+        with Session(engine) as session:
+            for job_id in list(self._leased):
+                repo.release_job(session, job_id, self.owner)
+        self._leased.clear()
+
+    async def _loop(self) -> None:
+        while True:
+            while self.executor.has_capacity():
+                with Session(engine) as session:
+                    job = repo.claim_job(session, self.owner, settings.JOB_LEASE_SECONDS)
+                if job is None:
+                    break
+                self._dispatch(job)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, job: RunJob) -> None:
+        if job.attempts > settings.JOB_MAX_ATTEMPTS:
+            with Session(engine) as session:
+                repo.finish_job(session, job.id, self.owner, "failed")
+                run = repo.get_run(session, job.run_id)
+                if run:
+                    log(session, run.id, "queue", f"Giving up after {job.attempts - 1} interrupted attempts", level="ERROR")
+                    repo.update_run_status(session, run, "failed")
+            return
+
+        self._leased[job.id] = job.run_id
+        self.executor.submit(job.run_id, self._run_job(job))
+
+    async def _run_job(self, job: RunJob) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job, asyncio.current_task()))
+        status: str | None = "failed"
+        try:
+            await self.handler(job)
+            status = "done"
+        except asyncio.CancelledError:
+            # Cancelled via the API (the job is already marked cancelled), lost lease
+            # (another worker owns it now) or shutdown: nothing to finish
+            status = None
+            raise
+        finally:
+            heartbeat.cancel()
+            self._leased.pop(job.id, None)
+            if status is not None or self._stopping:
+                with Session(engine) as session:
+                    if status is not None:
+                        repo.finish_job(session, job.id, self.owner, status)
+                    else:
+                        # Hand it back so the next start picks it up immediately
+                        repo.release_job(session, job.id, self.owner)
+            self.notify()
+
+    async def _heartbeat(self, job: RunJob, run_task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            with Session(engine) as session:
+                alive = repo.heartbeat_job(session, job.id, self.owner, settings.JOB_LEASE_SECONDS)
+            if not alive:
+                # Another worker reclaimed it; stop duplicating the work
+                self._leased.pop(job.id, None)
+                run_task.cancel()
+                return
@@ -0,0 +1,275 @@
+"""
+Standalone ASGI smoke test, run with the generated app's venv python:
+
+    python asgi_probe.py '<json list of checks>'
+
+A check is {"method", "path", "json"?, "expect"?, "assets"?}; see evaluate().
+Imports main:app from the current directory and drives it in memory (no socket,
+no uvicorn). Prints a single JSON report on stdout. Only the stdlib is used,
+because the venv has nothing but the app's own requirements; the backend imports
+run_checks() from here too, so both validation modes judge responses the same way.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import traceback
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+REQUEST_TIMEOUT = 10.0
+BODY_SNIPPET = 1000
+
+
+def _error(exc: BaseException) -> dict:
+    here = os.path.abspath(os.getcwd())
+    frames = [
+        {"file": os.path.relpath(f.filename, here), "line": f.lineno, "name": f.name, "code": f.line}
+        for f in traceback.extract_tb(exc.__traceback__)
+        if os.path.abspath(f.filename).startswith(here + os.sep)
+    ]
+    if isinstance(exc, SyntaxError) and exc.filename:
+        frames.append({"file": os.path.relpath(exc.filename, here), "line": exc.lineno, "name": "<module>", "code": (exc.text or "").strip()})
+    return {
+        "type": type(exc).__name__,
+        "message": str(exc),
+        "frames": frames,
+        "traceback": "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+    }
+
+
+async def _lifespan(app, events: list):
+    """
+    Run lifespan startup; returns (shutdown coroutine factory, error).
+    Apps without lifespan support are fine.
+    """
+    inbox: asyncio.Queue = asyncio.Queue()
+    started = asyncio.get_running_loop().create_future()
+
+    async def receive():
+        return await inbox.get()
+
+    async def send(message):
+        events.append(message["type"])
+        if message["type"] in ("lifespan.startup.complete", "lifespan.startup.failed") and not started.done():
+            started.set_result(message)
+
+    async def main():
+        try:
+            await app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send)
+        except BaseException as e:
+            if not started.done():
+                started.set_exception(e)
+
+    task = asyncio.ensure_future(main())
+    await inbox.put({"type": "lifespan.startup"})
+    try:
+        msg = await asyncio.wait_for(started, REQUEST_TIMEOUT)
+    except Exception:
+        # Apps that reject the lifespan scope simply don't use it
+        task.cancel()
+        return None, None
+    if msg["type"] == "lifespan.startup.failed":
+        return None, RuntimeError(msg.get("message") or "lifespan startup failed")
+
+    async def shutdown():
+        await inbox.put({"type": "lifespan.shutdown"})
+        try:
+            await asyncio.wait_for(task, REQUEST_TIMEOUT)
+        except Exception:
+            pass
+    return shutdown, None
+
+
+class _AssetParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == "script" and a.get("src"):
+            self.urls.append(a["src"])
+        elif tag == "link" and a.get("href"):
+            rel = (a.get("rel") or "").lower()
+            if "stylesheet" in rel or "icon" in rel:
+                self.urls.append(a["href"])
+        elif tag == "img" and a.get("src"):
+            self.urls.append(a["src"])
+
+
+def extract_assets(html: str, page_path: str) -> list:
+    """
+    Local asset paths (scripts, stylesheets, icons, images) linked from a page.
+    """
+    parser = _AssetParser()
+    try:
+        parser.feed(html)
+    except Exception:
+        return []
+    paths = []
+    for url in parser.urls:
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc or url.startswith(("#", "data:")):
+            continue
+        path = urlsplit(urljoin("http://app" + page_path, url)).path
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def evaluate(check: dict, status, content_type: str):
+    """
+    None if the response meets the check's expectations, else the reason it does not.
+    expect: {"status": [..], "not_status": [..], "content_type": "text/html"}; 5xx always fails.
+    """
+    expect = check.get("expect") or {}
+    if status is None:
+        return "no response"
+    if status >= 500:
+        return f"server error {status}"
+    if expect.get("status") and status not in expect["status"]:
+        return f"expected status {expect['status']}, got {status}"
+    if status in (expect.get("not_status") or []):
+        return f"unexpected status {status}"
+    if expect.get("content_type") and expect["content_type"] not in (content_type or ""):
+        return f"expected content-type {expect['content_type']}, got {content_type or 'none'}"
+    return None
+
+
+async def _one(send, check: dict) -> dict:
+    method = check.get("method", "GET")
+    result = {"method": method, "path": check["path"]}
+    if check.get("kind"):
+        result["kind"] = check["kind"]
+    if check.get("json") is not None:
+        result["json"] = check["json"]
+    t0 = time.perf_counter()
+    try:
+        status, content_type, body = await asyncio.wait_for(send(method, check["path"], check.get("json")), REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        status, content_type, body = None, "", b""
+        result["error"] = {"type": "TimeoutError", "message": f"no response within {REQUEST_TIMEOUT:g}s", "frames": [], "traceback": ""}
+    except BaseException as e:
+        status, content_type, body = None, "", b""
+        result["error"] = _error(e)
+    result["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    result["status"] = status
+    result["content_type"] = content_type
+    reason = evaluate(check, status, content_type) if "error" not in result else "raised " + result["error"]["type"]
+    result["ok"] = reason is None
+    text = body.decode("utf-8", errors="replace")
+    if reason:
+        result["reason"] = reason
+        result["body"] = text[:BODY_SNIPPET]
+    if check.get("assets") and result["ok"] and "html" in (content_type or ""):
+        result["assets"] = extract_assets(text, urlsplit(check["path"]).path)
+    return result
+
+
+async def run_checks(send, checks: list) -> list:
+    """
+    Run all checks concurrently, then every local asset the HTML pages link to.
+    `send(method, path, json)` returns (status, content_type, body bytes).
+    """
+    results = list(await asyncio.gather(*(_one(send, c) for c in checks)))
+    seen = {r["path"] for r in results}
+    assets = []
+    for r in results:
+        for path in r.get("assets", []):
+            if path not in seen:
+                seen.add(path)
+                assets.append({"method": "GET", "path": path, "kind": "asset", "expect": {"status": [200]}})
+    results += await asyncio.gather(*(_one(send, c) for c in assets))
+    return results
+
+
+def asgi_sender(app):
+    async def send_request(method: str, path: str, payload=None):
+        raw_path, _, query = path.partition("?")
+        body = b"" if payload is None else json.dumps(payload).encode()
+        headers = [(b"host", b"testserver"), (b"accept", b"*/*")]
+        if payload is not None:
+            headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": raw_path,
+            "raw_path": raw_path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        sent_body = False
+        start = {}
+        chunks = []
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        # Starlette sends its 500 page and then re-raises, so a failing route
+        # surfaces here as the original exception with its traceback
+        await app(scope, receive, send)
+        content_type = ""
+        for k, v in start.get("headers", []):
+            if k.lower() == b"content-type":
+                content_type = v.decode("latin-1")
+        return start.get("status"), content_type, b"".join(chunks)
+    return send_request
+
+
+async def probe(requests: list) -> dict:
+    report = {"ok": False, "phase": "import", "checks": []}
+    sys.path.insert(0, os.getcwd())
+    t0 = time.perf_counter()
+    try:
+        import main  # noqa: E402
+        app = getattr(main, "app")
+    except BaseException as e:
+        report["error"] = _error(e)
+        return report
+    report["import_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    report["phase"] = "lifespan"
+    events: list = []
+    shutdown, err = await _lifespan(app, events)
+    if err is not None:
+        report["error"] = _error(err) if err.__traceback__ else {"type": "RuntimeError", "message": str(err), "frames": [], "traceback": str(err)}
+        return report
+
+    report["phase"] = "requests"
+    try:
+        report["checks"] = await run_checks(asgi_sender(app), requests)
+    finally:
+        if shutdown is not None:
+            await shutdown()
+
+    report["ok"] = all(c["ok"] for c in report["checks"])
+    return report
+
+
+if __name__ == "__main__":
+    reqs = json.loads(sys.argv[1]) if len(sys.argv) > 1 else [{"method": "GET", "path": "/"}]
+    # The app's own prints must not corrupt the report on stdout
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    out = asyncio.run(probe(reqs))
+    real_stdout.write(json.dumps(out) + "\n")
+    real_stdout.flush()
@@ -13,7 +13,7 @@ class SandboxRunner(ABC):
     def setup(self, workspace: Path) -> None: ...
 
     @abstractmethod
-    def install_deps(self, workspace: Path, requirements_path: Path) -> ExecResult: ...
+    def install_deps(self, workspace: Path, requirements_path: Path, skip: frozenset[str] = frozenset()) -> ExecResult: ...
 
     @abstractmethod
     def run(self, workspace: Path, entrypoint: str) -> ExecResult: ...
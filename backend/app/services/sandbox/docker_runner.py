@@ -5,7 +5,7 @@ class DockerSandboxRunner(SandboxRunner):
     def setup(self, workspace: Path) -> None:
         raise NotImplementedError("Docker runner will be added later")
 
-    def install_deps(self, workspace: Path, requirements_path: Path) -> ExecResult:
+    def install_deps(self, workspace: Path, requirements_path: Path, skip: frozenset[str] = frozenset()) -> ExecResult:
         raise NotImplementedError("Docker runner will be added later")
 
     def run(self, workspace: Path, entrypoint: str) -> ExecResult:
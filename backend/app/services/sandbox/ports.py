@@ -0,0 +1,52 @@
+from __future__ import annotations
+import socket
+import threading
+from typing import Iterable, Set
+
+
+class PortAllocator:
+    """
+    Hands out preview ports from [start, end]. The lowest free port is picked,
+    so released ports are reused first; a port is only handed out if it can
+    actually be bound (stale processes outside our registry are skipped).
+    """
+    def __init__(self, start: int, end: int, reserved: Iterable[int] = ()):
+        self.start = start
+        self.end = end
+        self._reserved: Set[int] = set(reserved)
+        self._in_use: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_bindable(port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind(("0.0.0.0", port))
+            except OSError:
+                return False
+        return True
+
+    def allocate(self) -> int:
+        with self._lock:
+            for port in range(self.start, self.end + 1):
+                if port in self._in_use or port in self._reserved:
+                    continue
+                if self._is_bindable(port):
+                    self._in_use.add(port)
+                    return port
+        raise RuntimeError(f"No free preview port in {self.start}-{self.end}")
+
+    def claim(self, port: int) -> None:
+        """
+        Mark a port as taken by a process we adopted (e.g. after a restart).
+        """
+        with self._lock:
+            self._in_use.add(port)
+
+    def release(self, port: int) -> None:
+        with self._lock:
+            self._in_use.discard(port)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"range": [self.start, self.end], "in_use": len(self._in_use)}
@@ -0,0 +1,32 @@
+from __future__ import annotations
+import os
+import signal
+import subprocess
+
+
+def new_group_kwargs() -> dict:
+    """
+    Popen kwargs that start the child in its own process group/session,
+    so the whole tree (uvicorn reloader, pip build backends...) can be killed at once.
+    """
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(pid: int) -> None:
+    """
+    Kill a process started with new_group_kwargs() together with its children.
+    Missing processes are ignored.
+    """
+    if os.name == "nt":
+        subprocess.run(
+            ["taskkill", "/F", "/T", "/PID", str(pid)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -0,0 +1,204 @@
+from __future__ import annotations
+import asyncio
+import os
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+from sqlmodel import Session
+
+from app.db import repo
+from app.db.database import engine
+from app.services.sandbox.base import ExecResult
+from app.services.sandbox.ports import PortAllocator
+from app.services.sandbox.process import new_group_kwargs, kill_process_tree
+from app.services.sandbox.venv_runner import VenvSandboxRunner
+
+LOG_TAIL_BYTES = 8000
+
+
+@dataclass
+class PreviewProcess:
+    run_id: int
+    pid: int
+    port: int
+    log_path: Path
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    proc: Optional[subprocess.Popen] = None
+
+
+def _tail(path: Path, limit: int = LOG_TAIL_BYTES) -> str:
+    if not path.exists():
+        return ""
+    with path.open("rb") as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(max(0, size - limit))
+        return f.read().decode("utf-8", errors="replace")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _probe_host(host: str) -> str:
+    return "127.0.0.1" if host in ("0.0.0.0", "::") else host
+
+
+class PreviewSupervisor:
+    """
+    Starts generated apps as background uvicorn processes and waits for them
+    to answer HTTP on "/". A ready app is kept in the registry and the caller
+    returns immediately; output goes to a log file in the workspace instead of memory.
+
+    Ports come from a PortAllocator and every ready app is recorded in the
+    AppProcess table, so adopt() can pick previews back up after a restart.
+    """
+    def __init__(self, runner: VenvSandboxRunner, ports: PortAllocator):
+        self.runner = runner
+        self.ports = ports
+        self._procs: Dict[int, PreviewProcess] = {}
+
+    def get(self, run_id: int) -> Optional[PreviewProcess]:
+        return self._procs.get(run_id)
+
+    def run_ids(self) -> list[int]:
+        return list(self._procs)
+
+    @staticmethod
+    def alive(entry: PreviewProcess) -> bool:
+        if entry.proc is not None:
+            return entry.proc.poll() is None
+        return _pid_alive(entry.pid)
+
+    async def start(
+        self,
+        run_id: int,
+        workspace: Path,
+        app_dir: Path,
+        host: str,
+        ready_timeout: float,
+    ) -> ExecResult:
+        """
+        Start the app on a freshly allocated port and probe readiness. exit_code 0
+        means ready and registered; otherwise the process is stopped, its port
+        released and stderr holds the tail of its output.
+        """
+        self.stop(run_id)
+        port = self.ports.allocate()
+        try:
+            return await self._start(run_id, workspace, app_dir, host, port, ready_timeout)
+        finally:
+            if run_id not in self._procs:
+                self.ports.release(port)
+
+    async def _start(
+        self,
+        run_id: int,
+        workspace: Path,
+        app_dir: Path,
+        host: str,
+        port: int,
+        ready_timeout: float,
+    ) -> ExecResult:
+        log_path = workspace / "preview.log"
+        with log_path.open("wb") as log_file:
+            proc = subprocess.Popen(
+                self.runner.uvicorn_cmd(workspace, host, port),
+                cwd=str(app_dir),
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                **new_group_kwargs(),
+            )
+        entry = PreviewProcess(run_id=run_id, pid=proc.pid, port=port, log_path=log_path, proc=proc)
+        self._procs[run_id] = entry
+
+        url = f"http://{_probe_host(host)}:{port}/"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ready_timeout
+        try:
+            async with httpx.AsyncClient(timeout=2) as client:
+                while loop.time() < deadline:
+                    if proc.poll() is not None:
+                        self._procs.pop(run_id, None)
+                        return ExecResult(exit_code=proc.returncode or 1, stdout="", stderr=_tail(log_path))
+                    try:
+                        r = await client.get(url)
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.1)
+                        continue
+                    if r.status_code < 500:
+                        with Session(engine) as session:
+                            repo.save_app_process(session, run_id, entry.pid, port, str(log_path), entry.started_at)
+                        return ExecResult(exit_code=0, stdout=f"Ready on {url} (GET / -> {r.status_code})", stderr="")
+                    self.stop(run_id)
+                    return ExecResult(
+                        exit_code=1,
+                        stdout="",
+                        stderr=f"GET / returned {r.status_code}\n{r.text[:2000]}\n{_tail(log_path)}",
+                    )
+        except BaseException:
+            self.stop(run_id)
+            raise
+
+        self.stop(run_id)
+        return ExecResult(exit_code=1, stdout="", stderr=f"App not ready within {ready_timeout:g}s\n{_tail(log_path)}")
+
+    def stop(self, run_id: int) -> bool:
+        entry = self._procs.pop(run_id, None)
+        if entry is None:
+            return False
+        kill_process_tree(entry.pid)
+        if entry.proc is not None:
+            entry.proc.wait()
+        self.ports.release(entry.port)
+        with Session(engine) as session:
+            repo.delete_app_process(session, run_id)
+        return True
+
+    async def adopt(self, host: str = "127.0.0.1") -> int:
+        """
+        Re-register apps recorded by a previous backend process that are still
+        serving; stale records (dead pid or port not answering) are dropped.
+        Returns how many apps were adopted.
+        """
+        with Session(engine) as session:
+            records = repo.list_app_processes(session)
+        adopted = 0
+        async with httpx.AsyncClient(timeout=2) as client:
+            for rec in records:
+                alive = _pid_alive(rec.pid)
+                if alive:
+                    try:
+                        await client.get(f"http://{_probe_host(host)}:{rec.port}/")
+                    except httpx.TransportError:
+                        alive = False
+                if not alive:
+                    # A live pid that does not answer may have been reused by an
+                    # unrelated process, so the record is dropped without killing it.
+                    with Session(engine) as session:
+                        repo.delete_app_process(session, rec.run_id)
+                    continue
+                self.ports.claim(rec.port)
+                self._procs[rec.run_id] = PreviewProcess(
+                    run_id=rec.run_id,
+                    pid=rec.pid,
+                    port=rec.port,
+                    log_path=Path(rec.log_path),
+                    started_at=rec.started_at,
+                )
+                adopted += 1
+        return adopted
+
+    def stop_all(self) -> None:
+        for run_id in list(self._procs):
+            self.stop(run_id)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from app.services.sandbox.venv_runner import VenvSandboxRunner
+
+# Written into every pooled venv; travels with it into the workspace
+MARKER = ".pool_base.json"
+
+
+class VenvPool:
+    """
+    Ready-made venvs with the base packages installed, so a run's setup is a
+    directory rename instead of `python -m venv` plus a pip install.
+
+    Venvs are built under root/building/<id>/ and renamed to root/ready/<id>/
+    when complete, so a restart finds every finished venv and none half-built.
+    Once claims bring ready + building down to the low-water mark, the pool is
+    refilled up to `size` in the background, `refill_concurrency` builds at a time.
+    The runner only uses `python -m pip` / `python -m uvicorn`, which work from
+    a moved venv (the absolute shebangs of its console scripts don't).
+    """
+    def __init__(
+        self,
+        runner: "VenvSandboxRunner",
+        root: Path,
+        packages: List[str],
+        size: int,
+        low_water: int,
+        refill_concurrency: int,
+    ):
+        self.runner = runner
+        self.root = Path(root)
+        self.packages = list(packages)
+        self.size = max(0, size)
+        self.low_water = min(max(0, low_water), self.size)
+        self._threads = ThreadPoolExecutor(max_workers=max(1, refill_concurrency), thread_name_prefix="venv-pool")
+        self.refill_concurrency = max(1, refill_concurrency)
+        self._lock = threading.Lock()
+        self._ready: List[str] = []
+        self._building = 0
+        self._stopped = False
+        self.claimed = 0
+        self.misses = 0
+        self.built = 0
+        self.build_failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def _signature(self) -> dict:
+        return {"packages": self.packages, "python": sys.executable, "version": sys.version}
+
+    def _venv(self, slot: Path) -> Path:
+        return slot / self.runner.venv_dir_name
+
+    def start(self) -> None:
+        """
+        Adopt finished venvs from a previous process (if built for the same
+        packages and interpreter), drop half-built ones, then fill up.
+        """
+        if not self.enabled:
+            return
+        shutil.rmtree(self.root / "building", ignore_errors=True)
+        ready_dir = self.root / "ready"
+        ready_dir.mkdir(parents=True, exist_ok=True)
+        for slot in sorted(ready_dir.iterdir()):
+            try:
+                marker = json.loads((self._venv(slot) / MARKER).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                marker = None
+            if marker == self._signature():
+                self._ready.append(slot.name)
+            else:
+                shutil.rmtree(slot, ignore_errors=True)
+        self._refill()
+
+    def _refill(self) -> None:
+        with self._lock:
+            if self._stopped or len(self._ready) + self._building > self.low_water:
+                return
+            needed = self.size - len(self._ready) - self._building
+            self._building += needed
+        for _ in range(needed):
+            self._threads.submit(self._build)
+
+    def _build(self) -> None:
+        slot_id = uuid.uuid4().hex[:12]
+        slot = self.root / "building" / slot_id
+        try:
+            slot.mkdir(parents=True, exist_ok=True)
+            self.runner.create_venv(slot)
+            res = self.runner.install_packages(slot, self.packages)
+            if res.exit_code != 0:
+                raise RuntimeError(res.stderr.strip()[-500:] or "base package install failed")
+            (self._venv(slot) / MARKER).write_text(json.dumps(self._signature()), encoding="utf-8")
+            (self.root / "ready").mkdir(parents=True, exist_ok=True)
+            os.rename(slot, self.root / "ready" / slot_id)
+        except Exception as e:
+            shutil.rmtree(slot, ignore_errors=True)
+            with self._lock:
+                self._building -= 1
+                self.build_failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+            return
+        with self._lock:
+            self._building -= 1
+            self._ready.append(slot_id)
+            self.built += 1
+
+    def claim(self, dest: Path) -> bool:
+        """
+        Move a ready venv to `dest`. False if none is ready (or the move fails),
+        in which case the caller builds its own.
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            slot_id = self._ready.pop(0) if self._ready else None
+            if slot_id is None:
+                self.misses += 1
+        claimed = False
+        if slot_id is not None:
+            slot = self.root / "ready" / slot_id
+            try:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(self._venv(slot), dest)
+                claimed = True
+            except OSError as e:
+                # e.g. the pool is on another filesystem than the workspace
+                with self._lock:
+                    self.misses += 1
+                    self.last_error = f"claim failed: {e}"
+            shutil.rmtree(slot, ignore_errors=True)
+            if claimed:
+                with self._lock:
+                    self.claimed += 1
+        self._refill()
+        return claimed
+
+    def stop(self) -> None:
+        """
+        Stop refilling and kill builds in progress; ready venvs stay on disk for the next start.
+        """
+        with self._lock:
+            self._stopped = True
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self.runner.kill(self.root)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "low_water": self.low_water,
+                "refill_concurrency": self.refill_concurrency,
+                "ready": len(self._ready),
+                "building": self._building,
+                "claimed": self.claimed,
+                "misses": self.misses,
+                "built": self.built,
+                "build_failures": self.build_failures,
+                "last_error": self.last_error,
+            }
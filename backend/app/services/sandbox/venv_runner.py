@@ -1,13 +1,31 @@
 from __future__ import annotations
+import json
 import os
+import re
 import subprocess
 import sys
+import threading
 from pathlib import Path
 from app.services.sandbox.base import SandboxRunner, ExecResult
+from app.services.sandbox.process import new_group_kwargs, kill_process_tree
+from app.services.sandbox.venv_pool import MARKER, VenvPool
+
+def normalize_requirement_name(requirement: str) -> str:
+    """
+    "Fast_API[all]>=1.0" -> "fast-api" (PEP 503 normalized project name).
+    """
+    name = re.split(r"[\s\[<>=!~;@]", requirement.strip(), maxsplit=1)[0]
+    return re.sub(r"[-_.]+", "-", name).lower()
+
 
 class VenvSandboxRunner(SandboxRunner):
     def __init__(self, venv_dir_name: str = ".venv_sandbox"):
         self.venv_dir_name = venv_dir_name
+        # Pre-warmed venvs, claimed by setup() when one is ready
+        self.pool: VenvPool | None = None
+        # Live subprocesses -> their cwd, so a cancelled run can be torn down
+        self._procs: dict[subprocess.Popen, Path] = {}
+        self._procs_lock = threading.Lock()
 
     def _venv_dir(self, workspace: Path) -> Path:
         return workspace / self.venv_dir_name
@@ -21,32 +39,125 @@ class VenvSandboxRunner(SandboxRunner):
     def _pip_cmd(self, workspace: Path) -> list[str]:
         return [str(self._python_path(workspace)), "-m", "pip"]
 
+    def is_ready(self, workspace: Path) -> bool:
+        return self._python_path(workspace).exists()
+
     def setup(self, workspace: Path) -> None:
+        venv_dir = self._venv_dir(workspace)
+        if venv_dir.exists():
+            return
+        if self.pool is not None and self.pool.claim(venv_dir):
+            return
+        self.create_venv(workspace)
+
+    def create_venv(self, workspace: Path) -> None:
         venv_dir = self._venv_dir(workspace)
         if not venv_dir.exists():
-            subprocess.run([sys.executable, "-m", "venv", str(venv_dir)], check=True)
+            cmd = [sys.executable, "-m", "venv", str(venv_dir)]
+            res = self._exec(cmd, cwd=workspace)
+            if res.exit_code != 0:
+                raise subprocess.CalledProcessError(res.exit_code, cmd, res.stdout, res.stderr)
 
-    def install_deps(self, workspace: Path, requirements_path: Path) -> ExecResult:
-        if (not requirements_path.exists()) or requirements_path.read_text(encoding="utf-8").strip() == "":
-            return ExecResult(exit_code=0, stdout="No requirements to install.", stderr="")
+    def preinstalled(self, workspace: Path) -> frozenset[str]:
+        """
+        Normalized names of the packages a pooled venv came with (empty for a fresh venv).
+        """
+        try:
+            marker = json.loads((self._venv_dir(workspace) / MARKER).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return frozenset()
+        return frozenset(normalize_requirement_name(p) for p in marker.get("packages", []))
 
-        cmd = self._pip_cmd(workspace) + [
+    def _pip_install_cmd(self, workspace: Path) -> list[str]:
+        return self._pip_cmd(workspace) + [
             "install",
             "--no-input",
             "--disable-pip-version-check",
             "--default-timeout", "120",
-            "-r", str(requirements_path),
         ]
-        return self._exec(cmd, cwd=workspace)
 
-    def run_uvicorn(self, workspace: Path, app_dir: Path, host: str, port: int) -> ExecResult:
+    def install_packages(self, workspace: Path, packages: list[str]) -> ExecResult:
+        if not packages:
+            return ExecResult(exit_code=0, stdout="No packages to install.", stderr="")
+        return self._exec(self._pip_install_cmd(workspace) + list(packages), cwd=workspace)
+
+    def install_deps(self, workspace: Path, requirements_path: Path, skip: frozenset[str] = frozenset()) -> ExecResult:
+        """
+        Install requirements.txt. Bare entries (no version/extras) whose name is in
+        `skip` are already in the venv and are left out, so only the diff is installed.
+        """
+        if (not requirements_path.exists()) or requirements_path.read_text(encoding="utf-8").strip() == "":
+            return ExecResult(exit_code=0, stdout="No requirements to install.", stderr="")
+
+        if not skip:
+            return self._exec(self._pip_install_cmd(workspace) + ["-r", str(requirements_path)], cwd=workspace)
+
+        pending = []
+        for line in requirements_path.read_text(encoding="utf-8").splitlines():
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("-"):
+                # pip options (-r, -e, --index-url ...): fall back to a full install
+                return self._exec(self._pip_install_cmd(workspace) + ["-r", str(requirements_path)], cwd=workspace)
+            if normalize_requirement_name(line) in skip and re.fullmatch(r"[A-Za-z0-9._-]+", line):
+                continue
+            pending.append(line)
+
+        if not pending:
+            return ExecResult(exit_code=0, stdout="All requirements already installed.", stderr="")
+        return self.install_packages(workspace, pending)
+
+    def uvicorn_cmd(self, workspace: Path, host: str, port: int) -> list[str]:
         py = str(self._python_path(workspace))
-        cmd = [py, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)]
-        return self._exec(cmd, cwd=app_dir)
+        return [py, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)]
+
+    def run_uvicorn(self, workspace: Path, app_dir: Path, host: str, port: int) -> ExecResult:
+        return self._exec(self.uvicorn_cmd(workspace, host, port), cwd=app_dir)
+
+    def run_script(
+        self, workspace: Path, script: Path, args: list[str], cwd: Path, timeout: float | None = None
+    ) -> ExecResult:
+        """
+        Run a standalone python script with the venv interpreter.
+        """
+        return self._exec([str(self._python_path(workspace)), str(script), *args], cwd=cwd, timeout=timeout)
 
-    def _exec(self, cmd: list[str], cwd: Path) -> ExecResult:
-        p = subprocess.run(cmd, cwd=str(cwd), capture_output=True, text=True)
-        return ExecResult(exit_code=p.returncode, stdout=p.stdout, stderr=p.stderr)
+    def _exec(self, cmd: list[str], cwd: Path, timeout: float | None = None) -> ExecResult:
+        p = subprocess.Popen(
+            cmd,
+            cwd=str(cwd),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            **new_group_kwargs(),
+        )
+        with self._procs_lock:
+            self._procs[p] = Path(cwd).resolve()
+        try:
+            try:
+                stdout, stderr = p.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                kill_process_tree(p.pid)
+                stdout, stderr = p.communicate()
+                return ExecResult(exit_code=124, stdout=stdout, stderr=f"{stderr}\nTimed out after {timeout:g}s")
+        finally:
+            with self._procs_lock:
+                self._procs.pop(p, None)
+        return ExecResult(exit_code=p.returncode, stdout=stdout, stderr=stderr)
+
+    def kill(self, workspace: Path) -> int:
+        """
+        Kill every subprocess (and its children) running inside this workspace.
+        This also frees any port a generated server was listening on.
+        Returns how many process trees were killed.
+        """
+        root = Path(workspace).resolve()
+        with self._procs_lock:
+            victims = [p for p, cwd in self._procs.items() if cwd == root or root in cwd.parents]
+        for p in victims:
+            kill_process_tree(p.pid)
+        return len(victims)
 
     def run(self, workspace: Path, entrypoint: str) -> ExecResult:
         py = str(self._python_path(workspace))
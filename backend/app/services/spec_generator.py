@@ -1,8 +1,9 @@
 from __future__ import annotations
+from contextlib import aclosing
+from app.core.config import settings
+from app.core.json_stream import JsonObjectStream, model_keys
 from app.services.prompt_to_spec import TaskSpec
-from app.services.llm.base import LLMClient
-
-from app.core.utils import extract_json
+from app.services.llm.base import LLMClient, guarded_stream
 
 SYSTEM_SPEC = """You convert a user prompt into a STRICT JSON TaskSpec.
 Return ONLY valid JSON. No markdown. No explanations.
@@ -27,16 +28,22 @@ IMPORTANT:
 - Ensure all strings are properly escaped.
 """
 
+async def _stream_spec(llm: LLMClient, model: str, system: str, user: str) -> TaskSpec:
+    # Keys TaskSpec would reject abort the request as soon as they are read
+    scanner = JsonObjectStream(allowed_keys=model_keys(TaskSpec))
+    stream = guarded_stream(llm, model, system, user, settings.LLM_FIRST_TOKEN_SECONDS, settings.LLM_STALL_SECONDS)
+    async with aclosing(stream):
+        async for chunk in stream:
+            scanner.feed(chunk)
+            if scanner.done:
+                break
+    return TaskSpec.model_validate(scanner.close())
+
 async def llm_prompt_to_spec(llm: LLMClient, model: str, prompt: str) -> TaskSpec:
     user = f"USER_PROMPT:\n{prompt}\n\nReturn TaskSpec JSON only."
-    raw = await llm.chat(model=model, system=SYSTEM_SPEC, user=user)
-    
-    cleaned = extract_json(raw)
-    
+
     try:
-        return TaskSpec.model_validate_json(cleaned)
+        return await _stream_spec(llm, model, SYSTEM_SPEC, user)
     except Exception as e:
         fix_system = f"{SYSTEM_SPEC}\n\nYour previous output had validation errors:\n{str(e)}\n\nOutput ONLY corrected JSON."
-        raw2 = await llm.chat(model=model, system=fix_system, user=user)
-        cleaned2 = extract_json(raw2)
-        return TaskSpec.model_validate_json(cleaned2)
+        return await _stream_spec(llm, model, fix_system, user)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+import json
+import re
+from pathlib import Path
+
+import httpx
+
+from app.core.config import settings
+from app.services.prompt_to_spec import TaskSpec
+from app.services.sandbox import asgi_probe
+from app.services.sandbox.base import ExecResult
+from app.services.sandbox.venv_runner import VenvSandboxRunner
+
+PROBE_SCRIPT = Path(asgi_probe.__file__)
+
+DEFAULT_CHECKS = [{"method": "GET", "path": "/"}]
+
+_PATH_PARAM = re.compile(r"\{[^}]+\}")
+
+
+def build_checks(spec: TaskSpec | None) -> list[dict]:
+    """
+    Smoke checks derived from the spec: every page is served as HTML (and its
+    linked assets resolve), every API path answers on its declared method.
+    """
+    if spec is None:
+        return list(DEFAULT_CHECKS)
+
+    checks: list[dict] = []
+    seen = set()
+    for page in spec.pages:
+        route = page.route if page.route.startswith("/") else "/" + page.route
+        if ("GET", route) in seen:
+            continue
+        seen.add(("GET", route))
+        checks.append({
+            "method": "GET",
+            "path": route,
+            "kind": "page",
+            "assets": True,
+            "expect": {"status": [200], "content_type": "text/html"},
+        })
+    for api in spec.api:
+        if (api.method, api.path) in seen:
+            continue
+        seen.add((api.method, api.path))
+        has_params = bool(_PATH_PARAM.search(api.path))
+        check = {
+            "method": api.method,
+            "path": _PATH_PARAM.sub("1", api.path),
+            "kind": "api",
+            # 404/405 mean the declared route is missing; 4xx from validation is fine.
+            # With path params, 404 can just mean "no record 1".
+            "expect": {"not_status": [405] if has_params else [404, 405]},
+        }
+        if api.method in ("POST", "PUT"):
+            check["json"] = {}
+        checks.append(check)
+    if ("GET", "/") not in seen:
+        checks.insert(0, {"method": "GET", "path": "/", "kind": "page", "assets": True})
+    return checks
+
+
+def format_error(error: dict) -> str:
+    """
+    Repair-friendly text for a probe error: the app-side frames first, then the full traceback.
+    """
+    lines = [f"{error.get('type')}: {error.get('message')}"]
+    for f in error.get("frames") or []:
+        lines.append(f'  File "{f["file"]}", line {f["line"]}, in {f["name"]}')
+        if f.get("code"):
+            lines.append(f"    {f['code']}")
+    if error.get("traceback"):
+        lines += ["", error["traceback"].rstrip()]
+    return "\n".join(lines)
+
+
+def _format_check(c: dict) -> str:
+    request = f"{c['method']} {c['path']}"
+    if "json" in c:
+        request += f" json={json.dumps(c['json'])}"
+    lines = [
+        f"Request: {request}" + (f"  ({c['kind']})" if c.get("kind") else ""),
+        f"Response: {c.get('status')} {c.get('content_type') or ''}".rstrip(),
+        f"Problem: {c.get('reason')}",
+    ]
+    if c.get("body"):
+        lines.append(f"Body: {c['body']}")
+    if "error" in c:
+        lines.append(format_error(c["error"]))
+    return "\n".join(lines)
+
+
+def format_report(report: dict) -> str:
+    """
+    Only the failing requests, each with the exact request, response and traceback.
+    """
+    if report.get("error"):
+        return f"[{report.get('phase')}] {format_error(report['error'])}"
+    failed = [c for c in report.get("checks", []) if not c.get("ok")]
+    return "\n\n".join(_format_check(c) for c in failed)
+
+
+def summarize(report: dict) -> str:
+    checks = report.get("checks", [])
+    slowest = sorted(checks, key=lambda c: c["ms"], reverse=True)[:5]
+    latency = ", ".join(f"{c['method']} {c['path']} {c['ms']:g} ms" for c in slowest)
+    head = f"{len(checks)} route checks passed"
+    if "import_ms" in report:
+        head += f" (import {report['import_ms']:g} ms)"
+    return f"{head}; slowest: {latency}" if latency else head
+
+
+def _result(report: dict) -> ExecResult:
+    if report.get("ok"):
+        return ExecResult(exit_code=0, stdout=summarize(report), stderr="")
+    passed = sum(1 for c in report.get("checks", []) if c.get("ok"))
+    return ExecResult(
+        exit_code=1,
+        stdout=f"{passed}/{len(report.get('checks', []))} route checks passed",
+        stderr=format_report(report),
+    )
+
+
+def validate_in_process(
+    runner: VenvSandboxRunner,
+    workspace: Path,
+    app_dir: Path,
+    checks: list[dict] | None = None,
+) -> tuple[ExecResult, dict | None]:
+    """
+    Import main:app inside the run's venv and drive it through an in-memory ASGI
+    transport (no server, no port). Returns an ExecResult shaped like a server run
+    (stderr carries the failing requests on failure) plus the structured report.
+    """
+    res = runner.run_script(
+        workspace,
+        PROBE_SCRIPT,
+        [json.dumps(checks or DEFAULT_CHECKS)],
+        cwd=app_dir,
+        timeout=settings.PREVIEW_READY_SECONDS,
+    )
+    try:
+        report = json.loads(res.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return ExecResult(exit_code=res.exit_code or 1, stdout=res.stdout, stderr=res.stderr), None
+    return _result(report), report
+
+
+async def validate_over_http(base_url: str, checks: list[dict] | None = None) -> tuple[ExecResult, dict]:
+    """
+    Run the same checks against a live server, concurrently.
+    """
+    async with httpx.AsyncClient(base_url=base_url, timeout=asgi_probe.REQUEST_TIMEOUT) as client:
+        async def send(method: str, path: str, payload=None):
+            try:
+                r = await client.request(method, path, json=payload)
+            except httpx.TransportError as e:
+                return None, "", f"{type(e).__name__}: {e}".encode()
+            return r.status_code, r.headers.get("content-type", ""), r.content
+
+        results = await asgi_probe.run_checks(send, checks or DEFAULT_CHECKS)
+    report = {"ok": all(c["ok"] for c in results), "phase": "requests", "checks": results}
+    return _result(report), report
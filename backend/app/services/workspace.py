@@ -1,6 +1,13 @@
+import os
+import shutil
 from pathlib import Path
 from app.core.config import settings
 
+# Clone members hardlinked to the original: code and static assets, which patches
+# replace via os.replace and apps don't write to. Anything else (.txt/.json/.db data
+# an app may append to while it is probed) is copied.
+LINKED_SUFFIXES = {".py", ".html", ".css", ".js", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".ico"}
+
 def project_workspace(project_id: int, run_id: int) -> Path:
     root = settings.WORKSPACE_ROOT
     path = root / f"project_{project_id}" / f"run_{run_id}"
@@ -12,3 +19,26 @@ def write_files(ws: Path, files: list[dict]) -> None:
         p = ws / f["path"]
         p.parent.mkdir(parents=True, exist_ok=True)
         p.write_text(f["content"], encoding="utf-8")
+
+def clone_workspace(ws: Path, dest: Path, venv_dir_name: str) -> Path:
+    """
+    Cheap copy-on-write clone of the generated app: source files are hardlinked,
+    the venv is shared through a symlink. Writers must replace files rather than
+    modify them in place (the patcher does), or the original changes too.
+    """
+    shutil.rmtree(dest, ignore_errors=True)
+    src_root = ws / "generated_app"
+    for src in src_root.rglob("*"):
+        if "__pycache__" in src.parts or not src.is_file():
+            continue
+        target = dest / src.relative_to(ws)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if src.suffix in LINKED_SUFFIXES:
+            try:
+                os.link(src, target)
+                continue
+            except OSError:
+                pass  # cross-device or unsupported: fall back to a copy
+        shutil.copy2(src, target)
+    os.symlink((ws / venv_dir_name).resolve(), dest / venv_dir_name, target_is_directory=True)
+    return dest
@@ -44,10 +44,27 @@ export default function PreviewPage() {
     }
   }
 
-  const handlePreview = () => {
+  const handlePreview = async () => {
     if (projectInfo?.runId) {
-      const port = 8000 + projectInfo.runId
-      window.open(`http://127.0.0.1:${port}`, '_blank')
+      const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+      // Opened while still inside the click, or popup blockers stop it
+      const tab = window.open('about:blank', '_blank')
+      try {
+        // Previews scale to zero; this starts the app again if it was stopped
+        const res = await fetch(`${apiUrl}/runs/${projectInfo.runId}/preview`, { method: 'POST' })
+        const preview = await res.json()
+        if (res.ok && preview.url) {
+          if (tab) {
+            tab.location.href = `${apiUrl}${preview.url}`
+          } else {
+            window.location.href = `${apiUrl}${preview.url}`
+          }
+          return
+        }
+      } catch {
+        // fall through and close the placeholder tab
+      }
+      tab?.close()
     }
   }
 